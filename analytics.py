@@ -0,0 +1,280 @@
+"""
+Nutrient series over any date range: day / week / month buckets for any
+subset of the nutrient columns, from one rollup query and a NumPy
+resample.
+
+Buckets that lie entirely in the past ("closed") are cached per user in
+a SQLite file shared by the workers; writing a food log drops the
+cached buckets that contain its date (invalidate()).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from config import REPORT_CACHE
+from database import NUTRIENT_COLUMNS
+
+GRANULARITIES = ("day", "week", "month")
+MAX_BUCKETS = 1000
+
+# log_count + every nutrient: what a cached bucket holds
+VECTOR_COLUMNS = ["log_count"] + NUTRIENT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+def bucket_count(start, end, granularity):
+    if granularity == "day":
+        return (end - start).days + 1
+    if granularity == "week":
+        return (end - start).days // 7 + (start.weekday() > end.weekday()) + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def bucket_spans(start, end, granularity):
+    """
+    → (span starts, span ends) as datetime64[D] arrays, clipped to
+    [start, end]; weeks start on Monday
+    """
+    first = np.datetime64(start, "D")
+    last = np.datetime64(end, "D")
+
+    if granularity == "day":
+        starts = np.arange(first, last + 1)
+    elif granularity == "week":
+        monday = first - np.timedelta64(start.weekday(), "D")
+        starts = np.arange(monday, last + 1, np.timedelta64(7, "D"))
+    else:
+        months = np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1)
+        starts = months.astype("datetime64[D]")
+
+    ends = np.append(starts[1:] - 1, last)
+    starts = np.maximum(starts, first)
+    return starts, ends
+
+
+def series_query(user_id, start, end):
+    return f"""
+        SELECT log_date, {", ".join(VECTOR_COLUMNS)}
+        FROM daily_nutrient_rollups
+        WHERE user_id=%s AND log_date BETWEEN %s AND %s
+        ORDER BY log_date
+    """, (user_id, start, end)
+
+
+def resample(rows, starts, ends):
+    """
+    rows [(log_date, log_count, *nutrients)] → totals per span,
+    (spans x VECTOR_COLUMNS) float array
+    """
+    totals = np.zeros((len(starts), len(VECTOR_COLUMNS)))
+    if not rows:
+        return totals
+
+    dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+
+    bucket = np.searchsorted(starts, dates, side="right") - 1
+    inside = (bucket >= 0) & (dates <= ends[np.maximum(bucket, 0)])
+    np.add.at(totals, bucket[inside], values[inside])
+    return totals
+
+
+class ReportCache:
+    """
+    (user, span start, span end) → bucket vector for closed spans.
+    A per-user generation, bumped by invalidate(), keeps a report that
+    read the rollups before a write from caching what it read.
+    """
+
+    def __init__(self, path, max_entries, evict_interval):
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self._next_eviction = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS report_cache (
+              user_id INTEGER NOT NULL,
+              span_start TEXT NOT NULL,
+              span_end TEXT NOT NULL,
+              data TEXT NOT NULL,
+              created_at REAL NOT NULL,
+              PRIMARY KEY (user_id, span_start, span_end)
+            );
+            CREATE INDEX IF NOT EXISTS report_cache_created ON report_cache (created_at);
+            CREATE TABLE IF NOT EXISTS report_cache_generation (
+              user_id INTEGER PRIMARY KEY,
+              generation INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def generation(self, user_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT generation FROM report_cache_generation WHERE user_id=?", (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def load(self, user_id, start, end):
+        """
+        → {(span start, span end) ISO strings: vector} inside [start, end]
+        """
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT span_start, span_end, data FROM report_cache
+                WHERE user_id=? AND span_start >= ? AND span_end <= ?
+            """, (user_id, start.isoformat(), end.isoformat())).fetchall()
+        return {(s, e): json.loads(data) for s, e, data in rows}
+
+    def store(self, user_id, generation, spans):
+        """
+        spans: {(span start, span end): vector}. Dropped if the user's
+        logs changed since `generation` was read.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT generation FROM report_cache_generation WHERE user_id=?", (user_id,)
+                ).fetchone()
+                if (row[0] if row else 0) != generation:
+                    self._db.rollback()
+                    return False
+
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO report_cache VALUES (?,?,?,?,?)",
+                    [(user_id, s, e, json.dumps(v), now) for (s, e), v in spans.items()]
+                )
+                # size sweep at most once per evict_interval (per process)
+                if now >= self._next_eviction:
+                    self._next_eviction = now + self.evict_interval
+                    self._db.execute("""
+                        DELETE FROM report_cache WHERE rowid IN (
+                          SELECT rowid FROM report_cache
+                          ORDER BY created_at DESC
+                          LIMIT -1 OFFSET ?
+                        )
+                    """, (self.max_entries,))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return True
+
+    def invalidate(self, user_id, dates=None):
+        """
+        Drop cached spans containing any of `dates` (all of the user's
+        spans if None) and bump the user's generation
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if dates is None:
+                    self._db.execute("DELETE FROM report_cache WHERE user_id=?", (user_id,))
+                else:
+                    self._db.executemany("""
+                        DELETE FROM report_cache
+                        WHERE user_id=? AND span_start <= ? AND span_end >= ?
+                    """, [(user_id, d.isoformat(), d.isoformat()) for d in set(dates)])
+                self._db.execute("""
+                    INSERT INTO report_cache_generation (user_id, generation) VALUES (?, 1)
+                    ON CONFLICT(user_id) DO UPDATE SET generation=generation+1
+                """, (user_id,))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM report_cache")
+            self._db.execute("UPDATE report_cache_generation SET generation=generation+1")
+            self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache(**REPORT_CACHE)
+
+    return _cache
+
+
+def invalidate(user_id, dates=None):
+    """
+    Call after committing food logs for these dates (None: all dates)
+    """
+    try:
+        get_report_cache().invalidate(user_id, dates)
+    except sqlite3.Error:
+        # the report cache is only a cache; the write itself went through
+        logger.exception("report cache invalidate failed for user %s", user_id)
+
+
+def nutrient_series(db, user_id, start, end, granularity, columns):
+    """
+    → [{"start", "end", "days", "log_count", <column>: total}] per bucket
+    """
+    starts, ends = bucket_spans(start, end, granularity)
+    keys = [(str(s), str(e)) for s, e in zip(starts, ends)]
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+
+    cache = get_report_cache()
+    generation = cache.generation(user_id)
+    cached = cache.load(user_id, start, end)
+
+    vectors = {key: cached[key] for key in keys if key in cached}
+    missing = [i for i, key in enumerate(keys) if key not in vectors]
+
+    if missing:
+        # one range query over the rollups for every uncached bucket
+        query_start = starts[missing[0]].astype(date)
+        query_end = ends[missing[-1]].astype(date)
+
+        cursor = db.cursor()
+        cursor.execute(*series_query(user_id, query_start, query_end))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        totals = resample(rows, starts, ends)
+        fresh = {}
+        for i in missing:
+            vectors[keys[i]] = np.round(totals[i], 3).tolist()
+            if keys[i][1] <= yesterday:
+                fresh[keys[i]] = vectors[keys[i]]
+
+        if fresh:
+            try:
+                cache.store(user_id, generation, fresh)
+            except sqlite3.Error:
+                logger.exception("report cache store failed for user %s", user_id)
+
+    picks = [VECTOR_COLUMNS.index(col) for col in columns]
+    days = ((ends - starts).astype(int) + 1).tolist()
+
+    series = []
+    for (s, e), n_days in zip(keys, days):
+        vector = vectors[(s, e)]
+        bucket = {"start": s, "end": e, "days": n_days, "log_count": int(vector[0])}
+        bucket.update({col: vector[j] for col, j in zip(columns, picks)})
+        series.append(bucket)
+    return series
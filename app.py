@@ -1,18 +1,32 @@
-from flask import Flask, render_template, request, redirect, session, jsonify
+from flask import Flask, render_template, request, redirect, session, jsonify, stream_with_context, url_for
 from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db
-import random
+from database import NUTRIENT_COLUMNS, get_db, init_db, pool_stats
+import metrics
+import analytics
+from rollups import add_to_rollups, backfill_rollups
+from session_store import init_sessions
+import click
 from datetime import date, datetime, timedelta
-import os, uuid
-import base64
+import os
+import food_log_io
+import migrations
+import image_store
+import upstream
+from config import UPSTREAM
 from vision import analyze_food_image
-from food_data import match_food
+from food_catalog import NeighborsNotReady, get_catalog
 from meal_engine import generate_meal_plan
+from tip_pool import generate_tip, get_tip_pool
 from openai import OpenAI
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 app = Flask(__name__)
 app.secret_key = "nutrimind-secret-key"
+init_db(app)
+init_sessions(app)
+metrics.init_metrics(app)
+metrics.register_gauges("nutrimind_db_pool", pool_stats)
+metrics.register_gauges("nutrimind_match_cache", lambda: get_catalog().cache_stats())
 
 # HOME / LANDING
 @app.route("/")
@@ -22,6 +36,8 @@ def home():
     return render_template("landing.html")
 
 # LOGIN
+LOGIN_SQL = "SELECT * FROM users WHERE email=%s"
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -30,7 +46,7 @@ def login():
 
         db = get_db()
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email=%s", (email,))
+        cursor.execute(LOGIN_SQL, (email,))
         user = cursor.fetchone()
 
         if user:
@@ -40,6 +56,9 @@ def login():
                 password_hash = password_hash.decode("utf-8")
 
             if check_password_hash(password_hash, password):
+                # fresh session id: never reuse one the browser brought along
+                session.clear()
+                session.regenerate()
                 session["user_id"] = user["id"]
                 session["user_name"] = user["full_name"]
                 return redirect("/dashboard")
@@ -88,6 +107,26 @@ def dashboard():
         return redirect("/")
     return render_template("dashboard.html", user=session["user_name"])
 
+DASHBOARD_ROLLUPS_SQL = """
+    SELECT
+      log_date,
+      caloric_value calories,
+      protein,
+      carbohydrates carbs,
+      fat
+    FROM daily_nutrient_rollups
+    WHERE user_id=%s AND log_date BETWEEN %s AND %s
+"""
+
+DASHBOARD_MEALS_SQL = """
+    SELECT h.glasses, m.id meal_id, m.meal_type, m.title, m.calories
+    FROM (SELECT 1) q
+    LEFT JOIN hydration_logs h ON h.user_id=%s AND h.log_date=%s
+    LEFT JOIN meal_plans p ON p.user_id=%s AND p.plan_date=%s
+    LEFT JOIN meal_plan_meals m ON m.plan_id=p.id
+    ORDER BY m.id
+"""
+
 @app.route("/api/dashboard")
 def api_dashboard():
     if "user_id" not in session:
@@ -95,67 +134,51 @@ def api_dashboard():
 
     user_id = session["user_id"]
     date_q = request.args.get("date", date.today().isoformat())
+    today = datetime.strptime(date_q, "%Y-%m-%d").date()
+    monday = today - timedelta(days=today.weekday())
+
     db = get_db()
     c = db.cursor(dictionary=True)
 
-    # Intake Harian
-    c.execute("""
-        SELECT
-          COALESCE(SUM(caloric_value),0) calories,
-          COALESCE(SUM(protein),0) protein,
-          COALESCE(SUM(carbohydrates),0) carbs,
-          COALESCE(SUM(fat),0) fat
-        FROM food_logs
-        WHERE user_id=%s AND log_date=%s
-    """, (user_id, date_q))
-    intake = c.fetchone()
-
-    # Meal Log
-    c.execute("""
-        SELECT m.meal_type, m.title, m.calories
-        FROM meal_plans p
-        JOIN meal_plan_meals m ON p.id=m.plan_id
-        WHERE p.user_id=%s AND p.plan_date=%s
-    """, (user_id, date_q))
-    meals = c.fetchall()
-
-    time_map = {
-        "Breakfast": "08:00",
-        "Lunch": "13:00",
-        "Dinner": "19:00",
-        "Snack": "16:00"
-    }
+    # Intake Harian + Weekly Progress: the week's rollup rows
+    c.execute(DASHBOARD_ROLLUPS_SQL, (user_id, monday, monday + timedelta(days=6)))
+    totals = {row.pop("log_date"): row for row in c.fetchall()}
 
-    for m in meals:
-        m["time"] = time_map.get(m["meal_type"], "-")
-
-    # Hydration
-    c.execute("""
-        SELECT glasses FROM hydration_logs
-        WHERE user_id=%s AND log_date=%s
-    """, (user_id, date_q))
-    h = c.fetchone()
-    hydration = h["glasses"] if h else 0
-
-    # Weekly Progress
-    today = datetime.strptime(date_q, "%Y-%m-%d").date()
-    monday = today - timedelta(days=today.weekday())
+    intake = totals.get(today, {"calories": 0, "protein": 0, "carbs": 0, "fat": 0})
 
     weekly = []
     for i in range(7):
         d = monday + timedelta(days=i)
-        c.execute("""
-            SELECT COALESCE(SUM(caloric_value),0) total
-            FROM food_logs
-            WHERE user_id=%s AND log_date=%s
-        """, (user_id, d))
-
         weekly.append({
             "day": d.strftime("%a")[0],
-            "value": c.fetchone()["total"],
+            "value": totals[d]["calories"] if d in totals else 0,
             "is_today": d == today
         })
 
+    # Meal Log + Hydration: one row even without meals or water
+    c.execute(DASHBOARD_MEALS_SQL, (user_id, date_q, user_id, date_q))
+    rows = c.fetchall()
+
+    hydration = rows[0]["glasses"] or 0
+
+    time_map = {
+        "Breakfast": "08:00",
+        "Lunch": "13:00",
+        "Dinner": "19:00",
+        "Snack": "16:00"
+    }
+
+    meals = []
+    for r in rows:
+        if r["meal_id"] is None:
+            continue
+        meals.append({
+            "meal_type": r["meal_type"],
+            "title": r["title"],
+            "calories": r["calories"],
+            "time": time_map.get(r["meal_type"], "-")
+        })
+
     return jsonify({
         "user": session.get("user_name"),
         "intake": intake,
@@ -182,61 +205,29 @@ def add_water():
     db.commit()
     return jsonify({"status":"ok"})
 
-TIP_CATEGORIES = [
-    "hydration habit",
-    "protein intake",
-    "carbohydrate timing",
-    "healthy fat",
-    "portion control",
-    "meal timing",
-    "gut health",
-    "mindful eating",
-    "snack choice",
-    "sleep and nutrition"
-]
-
-TIP_STYLES = [
-    "practical advice",
-    "simple habit",
-    "did you know fact",
-    "daily challenge",
-    "common mistake to avoid"
-]
+# DAILY TIP: served from the pre-generated pool (tip_pool.py)
+def _generate_tip(category, style):
+    return generate_tip(client, category, style)
 
 @app.route("/api/daily-tip")
 def daily_tip():
-    category = random.choice(TIP_CATEGORIES)
-    style = random.choice(TIP_STYLES)
-
-    res = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a nutrition coach. "
-                    "Give concise, non-repetitive daily tips. "
-                    "Avoid generic advice like 'eat more fruits and vegetables'."
-                )
-            },
-            {
-                "role": "user",
-                "content": (
-                    f"Give ONE {style} nutrition tip about {category}. "
-                    "Max 18 words. No emojis. No explanations."
-                )
-            }
-        ],
-        temperature=1.2, 
-        presence_penalty=0.8,
-        frequency_penalty=0.6
-    )
+    pool = get_tip_pool()
+    # no-op after the first call; generation stays on the background thread
+    pool.start_refill(_generate_tip)
+
+    today = date.today()
 
     return jsonify({
-        "tip": res.choices[0].message.content.strip(),
-        "date": date.today().isoformat()
+        "tip": pool.pick(session.get("user_id", 0), today),
+        "date": today.isoformat()
     })
 
+@app.cli.command("fill-tips")
+def fill_tips_command():
+    """Fill the daily tip pool now (e.g. at deploy time); new tips serve from tomorrow."""
+    added = get_tip_pool().refill(_generate_tip)
+    click.echo(f"{added} tips added")
+
 # SCAN FOOD
 @app.route("/scanfood")
 def scanfood():
@@ -244,6 +235,30 @@ def scanfood():
         return redirect("/")
     return render_template("scanfood.html")
 
+# UPLOAD IMAGE (multipart "image" field or raw image body)
+@app.route("/api/upload-image", methods=["POST"])
+def api_upload_image():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.mimetype == "multipart/form-data":
+        file = request.files.get("image")
+        if not file:
+            return jsonify({"error": "No image"}), 400
+        stream = file.stream
+    else:
+        stream = request.stream
+
+    try:
+        image_id = image_store.save_image(stream)
+    except image_store.InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "image_id": image_id,
+        "url": url_for("static", filename=image_store.image_path(image_id))
+    })
+
 # API SCAN FOOD
 @app.route("/api/scan-food", methods=["POST"])
 def api_scan_food():
@@ -251,17 +266,29 @@ def api_scan_food():
         return jsonify({"error": "Unauthorized"}), 401
 
     data = request.get_json()
-    image_data = data.get("image")
-
-    if not image_data or "," not in image_data:
-        return jsonify({"error": "Invalid image format"}), 400
 
     try:
-        base64_image = image_data.split(",")[1]
+        if data.get("image_id"):
+            base64_image = image_store.read_image_base64(data["image_id"])
+        else:
+            # legacy data URL payload
+            image_data = data.get("image")
+            if not image_data or "," not in image_data:
+                return jsonify({"error": "Invalid image format"}), 400
+            base64_image = image_data.split(",")[1]
+    except image_store.InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
 
-        food_name = analyze_food_image(base64_image)
+    try:
+        # same image in flight → one vision call
+        food_name = upstream.call(
+            upstream.request_key("vision", base64_image),
+            UPSTREAM["vision_timeout"],
+            analyze_food_image,
+            base64_image
+        )
 
-        nutrition = match_food(food_name)
+        nutrition = get_catalog().match(food_name)
 
         if not nutrition:
             return jsonify({
@@ -274,6 +301,10 @@ def api_scan_food():
             "nutrition": nutrition
         })
 
+    except upstream.UpstreamTimeout as e:
+        print("SCAN FOOD TIMEOUT:", e)
+        return jsonify({"error": "Scan timed out"}), 504
+
     except Exception as e:
         print("SCAN FOOD ERROR:", e)
         return jsonify({"error": "Scan failed"}), 500
@@ -285,90 +316,166 @@ def add_food_log():
 
     data = request.get_json()
     nutrition = data.get("nutrition")
-    image = data.get("image")
 
     if not nutrition:
         return jsonify({"error": "No nutrition data"}), 400
 
     image_path = None
-    if image and "," in image:
-        img_bytes = base64.b64decode(image.split(",")[1])
-        os.makedirs("static/uploads", exist_ok=True)
-        filename = f"{uuid.uuid4().hex}.png"
-        image_path = f"uploads/{filename}"
-
-        with open(f"static/{image_path}", "wb") as f:
-            f.write(img_bytes)
+    try:
+        if data.get("image_id"):
+            image_path = image_store.image_path(data["image_id"])
+            if image_path is None:
+                return jsonify({"error": "Unknown image id"}), 400
+        elif data.get("image") and "," in data["image"]:
+            # legacy data URL payload: stored the same way as uploads
+            image_path = image_store.image_path(image_store.save_data_url(data["image"]))
+    except image_store.InvalidImage as e:
+        return jsonify({"error": str(e)}), 400
+
+    log_date = date.today()
+    values = {col: nutrition.get(col.replace("_", " ")) for col in NUTRIENT_COLUMNS}
 
     db = get_db()
     cursor = db.cursor()
 
-    cursor.execute("""
-        INSERT INTO food_logs (
-          user_id, food_name, image_path,
-          caloric_value, fat, saturated_fats,
-          monounsaturated_fats, polyunsaturated_fats,
-          carbohydrates, sugars, protein, dietary_fiber,
-          cholesterol, sodium, water,
-          vitamin_a, vitamin_b1, vitamin_b11, vitamin_b12,
-          vitamin_b2, vitamin_b3, vitamin_b5, vitamin_b6,
-          vitamin_c, vitamin_d, vitamin_e, vitamin_k,
-          calcium, copper, iron, magnesium, manganese,
-          phosphorus, potassium, selenium, zinc,
-          nutrition_density, log_date
-        )
-        VALUES (%s,%s,%s,
-        %s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,
-        %s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,
-        %s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-    """, (
-        session["user_id"],
-        nutrition["food"],
-        image_path,
-
-        nutrition.get("caloric value"),
-        nutrition.get("fat"),
-        nutrition.get("saturated fats"),
-        nutrition.get("monounsaturated fats"),
-        nutrition.get("polyunsaturated fats"),
-        nutrition.get("carbohydrates"),
-        nutrition.get("sugars"),
-        nutrition.get("protein"),
-        nutrition.get("dietary fiber"),
-        nutrition.get("cholesterol"),
-        nutrition.get("sodium"),
-        nutrition.get("water"),
-
-        nutrition.get("vitamin a"),
-        nutrition.get("vitamin b1"),
-        nutrition.get("vitamin b11"),
-        nutrition.get("vitamin b12"),
-        nutrition.get("vitamin b2"),
-        nutrition.get("vitamin b3"),
-        nutrition.get("vitamin b5"),
-        nutrition.get("vitamin b6"),
-        nutrition.get("vitamin c"),
-        nutrition.get("vitamin d"),
-        nutrition.get("vitamin e"),
-        nutrition.get("vitamin k"),
-
-        nutrition.get("calcium"),
-        nutrition.get("copper"),
-        nutrition.get("iron"),
-        nutrition.get("magnesium"),
-        nutrition.get("manganese"),
-        nutrition.get("phosphorus"),
-        nutrition.get("potassium"),
-        nutrition.get("selenium"),
-        nutrition.get("zinc"),
-
-        nutrition.get("nutrition density"),
-        date.today()
-    ))
+    try:
+        cursor.execute(f"""
+            INSERT INTO food_logs (
+              user_id, food_name, image_path,
+              {", ".join(NUTRIENT_COLUMNS)},
+              log_date
+            )
+            VALUES (%s,%s,%s,{",".join(["%s"] * len(NUTRIENT_COLUMNS))},%s)
+        """, (
+            session["user_id"],
+            nutrition["food"],
+            image_path,
+            *(values[col] for col in NUTRIENT_COLUMNS),
+            log_date
+        ))
+
+        add_to_rollups(cursor, session["user_id"], [(log_date, values)])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    analytics.invalidate(session["user_id"], [log_date])
 
-    db.commit()
     return jsonify({"status": "saved"})
 
+# SEARCH FOODS BY NUTRIENT RANGES
+# /api/foods/search?min_protein=20&max_caloric_value=300&sort=nutrition_density&order=desc&limit=50
+SEARCH_MAX_LIMIT = 200
+
+@app.route("/api/foods/search")
+def api_search_foods():
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    index = get_catalog().compiled.nutrient_index
+    bounds = {}
+
+    for key, value in request.args.items():
+        if not key.startswith(("min_", "max_")):
+            continue
+
+        column = index.column(key[4:])
+        if column is None:
+            return jsonify({"error": f"Unknown column: {key[4:]}"}), 400
+        try:
+            value = float(value)
+        except ValueError:
+            return jsonify({"error": f"Invalid number for {key}"}), 400
+
+        lo, hi = bounds.get(column, (None, None))
+        bounds[column] = (value, hi) if key.startswith("min_") else (lo, value)
+
+    sort = request.args.get("sort")
+    if sort:
+        sort = index.column(sort)
+        if sort is None:
+            return jsonify({"error": "Unknown sort column"}), 400
+
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    foods = get_catalog().search(
+        [(column, lo, hi) for column, (lo, hi) in bounds.items()],
+        sort=sort or None,
+        descending=request.args.get("order", "desc") != "asc",
+        limit=limit
+    )
+
+    return jsonify({"foods": foods, "count": len(foods)})
+
+# SIMILAR FOODS (nutrient profile), e.g. substitutes for a meal plan item
+SIMILAR_MAX_K = 50
+SIMILAR_MAX_FOODS = 50
+
+def _similar_json(food_name, matched, similar):
+    if matched is None:
+        return {"query": food_name, "found": False, "similar": []}
+
+    return {
+        "query": food_name,
+        "found": True,
+        "food": matched["food"],
+        "similar": [dict(data, similarity=score) for data, score in similar]
+    }
+
+@app.route("/api/foods/similar", methods=["GET", "POST"])
+def api_similar_foods():
+    """
+    GET ?food=<name>&k=10, or POST {"foods": [...], "k": 10} for a batch
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        foods = data.get("foods")
+        k = data.get("k", 10)
+    else:
+        foods = request.args.get("food")
+        k = request.args.get("k", 10)
+
+    try:
+        k = min(max(int(k), 1), SIMILAR_MAX_K)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid k"}), 400
+
+    catalog = get_catalog()
+
+    if request.method == "GET":
+        if not foods:
+            return jsonify({"error": "Missing food"}), 400
+        foods = [foods]
+    elif (not isinstance(foods, list) or not foods or len(foods) > SIMILAR_MAX_FOODS
+            or not all(isinstance(f, str) for f in foods)):
+        return jsonify({"error": f"foods must be a list of 1-{SIMILAR_MAX_FOODS} names"}), 400
+
+    try:
+        results = catalog.similar_many(foods, k)
+    except NeighborsNotReady:
+        # neighbor index still building after a deploy / data change
+        response = jsonify({"error": "Similar foods are not available yet"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    if request.method == "GET":
+        return jsonify(_similar_json(foods[0], *results[0]))
+
+    return jsonify({
+        "results": [
+            _similar_json(food, matched, similar)
+            for food, (matched, similar) in zip(foods, results)
+        ]
+    })
+
 # GENERATE MEAL PLAN
 @app.route("/generate-plan", methods=["GET", "POST"])
 def generateplan():
@@ -389,7 +496,10 @@ def api_generate_meal_plan():
 
     form = request.get_json()
 
-    plan = generate_meal_plan(form)
+    try:
+        plan = generate_meal_plan(form)
+    except upstream.UpstreamTimeout:
+        return jsonify({"error": "Meal plan generation timed out"}), 504
 
     session["meal_plan"] = plan
     return jsonify(plan)
@@ -405,60 +515,121 @@ def save_meal_plan():
     db = get_db()
     cursor = db.cursor()
 
-    cursor.execute("""
-        INSERT INTO meal_plans (user_id, plan_date, calories, protein, carbs, fat)
-        VALUES (%s,%s,%s,%s,%s,%s)
-        ON DUPLICATE KEY UPDATE
-          calories=VALUES(calories),
-          protein=VALUES(protein),
-          carbs=VALUES(carbs),
-          fat=VALUES(fat)
-    """, (
-        session["user_id"],
-        today,
-        data["summary"]["calories"],
-        data["summary"]["protein"],
-        data["summary"]["carbs"],
-        data["summary"]["fat"]
-    ))
-
-    db.commit()
-
-    cursor.execute("""
-        SELECT id FROM meal_plans
-        WHERE user_id=%s AND plan_date=%s
-    """, (session["user_id"], today))
-    plan_id = cursor.fetchone()[0]
-
-    # hapus meal lama (kalau overwrite)
-    cursor.execute("DELETE FROM meal_plan_meals WHERE plan_id=%s", (plan_id,))
-    db.commit()
-
-    for meal in data["meals"]:
+    # one transaction: readers never see a half-written plan
+    try:
+        # LAST_INSERT_ID(id) makes lastrowid the plan id on update too
         cursor.execute("""
-            INSERT INTO meal_plan_meals
-            (plan_id, meal_type, title, description, calories)
-            VALUES (%s,%s,%s,%s,%s)
+            INSERT INTO meal_plans (user_id, plan_date, calories, protein, carbs, fat)
+            VALUES (%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE
+              id=LAST_INSERT_ID(id),
+              calories=VALUES(calories),
+              protein=VALUES(protein),
+              carbs=VALUES(carbs),
+              fat=VALUES(fat)
         """, (
-            plan_id,
-            meal["type"],
-            meal["title"],
-            meal["desc"],
-            meal["calories"]
+            session["user_id"],
+            today,
+            data["summary"]["calories"],
+            data["summary"]["protein"],
+            data["summary"]["carbs"],
+            data["summary"]["fat"]
         ))
+        plan_id = cursor.lastrowid
+
+        # hapus meal lama (kalau overwrite)
+        cursor.execute("DELETE FROM meal_plan_meals WHERE plan_id=%s", (plan_id,))
+
+        meals = data["meals"]
 
-        meal_id = cursor.lastrowid
+        if meals:
+            # executemany → single multi-row INSERT
+            cursor.executemany("""
+                INSERT INTO meal_plan_meals
+                (plan_id, meal_type, title, description, calories)
+                VALUES (%s,%s,%s,%s,%s)
+            """, [
+                (plan_id, m["type"], m["title"], m["desc"], m["calories"])
+                for m in meals
+            ])
 
-        for item in meal["items"]:
+            # auto-increment ids follow insert order
             cursor.execute("""
-                INSERT INTO meal_plan_items (meal_id, item_name)
-                VALUES (%s,%s)
-            """, (meal_id, item))
+                SELECT id FROM meal_plan_meals
+                WHERE plan_id=%s
+                ORDER BY id
+            """, (plan_id,))
+            meal_ids = [row[0] for row in cursor.fetchall()]
+
+            items = [
+                (meal_id, item)
+                for meal_id, meal in zip(meal_ids, meals)
+                for item in meal["items"]
+            ]
+            if items:
+                cursor.executemany("""
+                    INSERT INTO meal_plan_items (meal_id, item_name)
+                    VALUES (%s,%s)
+                """, items)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
-    db.commit()
     return jsonify({"status": "saved"})
 
 # FOOD LOG
+# list view only needs these; the detail modal fetches the full row
+FOOD_LOG_LIST_COLUMNS = [
+    "id", "food_name", "image_path", "caloric_value",
+    "fat", "protein", "nutrition_density", "created_at"
+]
+FOOD_LOG_PAGE_SIZE = 50
+FOOD_LOG_STREAM_MAX_LIMIT = 10_000
+
+
+def parse_log_cursor(value):
+    """
+    "<created_at ISO>_<id>" → (created_at, id), None if missing
+    """
+    if not value:
+        return None
+    created_at, _, log_id = value.rpartition("_")
+    return datetime.fromisoformat(created_at), int(log_id)
+
+
+def make_log_cursor(row):
+    return f"{row['created_at'].isoformat()}_{row['id']}"
+
+
+def food_log_query(user_id, columns, date_q=None, cursor=None, limit=None):
+    """
+    Keyset page over (created_at, id), newest first
+    """
+    where = ["user_id=%s"]
+    params = [user_id]
+
+    if date_q:
+        where.append("log_date=%s")
+        params.append(date_q)
+
+    if cursor:
+        where.append("(created_at < %s OR (created_at = %s AND id < %s))")
+        params += [cursor[0], cursor[0], cursor[1]]
+
+    sql = f"""
+        SELECT {", ".join(columns)} FROM food_logs
+        WHERE {" AND ".join(where)}
+        ORDER BY created_at DESC, id DESC
+    """
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
 @app.route("/food-log")
 def foodlog():
     if "user_id" not in session:
@@ -466,24 +637,167 @@ def foodlog():
 
     date_q = request.args.get("date")  # YYYY-MM-DD
 
+    try:
+        cursor_q = parse_log_cursor(request.args.get("cursor"))
+    except ValueError:
+        return redirect("/food-log")
+
     db = get_db()
     cursor = db.cursor(dictionary=True)
 
-    if date_q:
-        cursor.execute("""
-            SELECT * FROM food_logs
-            WHERE user_id=%s AND log_date=%s
-            ORDER BY created_at DESC
-        """, (session["user_id"], date_q))
+    cursor.execute(*food_log_query(
+        session["user_id"], FOOD_LOG_LIST_COLUMNS,
+        date_q=date_q, cursor=cursor_q, limit=FOOD_LOG_PAGE_SIZE + 1
+    ))
+    logs = cursor.fetchall()
+
+    next_cursor = None
+    if len(logs) > FOOD_LOG_PAGE_SIZE:
+        logs = logs[:FOOD_LOG_PAGE_SIZE]
+        next_cursor = make_log_cursor(logs[-1])
+
+    return render_template("food-log.html", logs=logs, next_cursor=next_cursor)
+
+FOOD_LOG_DETAIL_SQL = "SELECT * FROM food_logs WHERE id=%s AND user_id=%s"
+
+@app.route("/api/food-log/<int:log_id>")
+def api_food_log_detail(log_id):
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(FOOD_LOG_DETAIL_SQL, (log_id, session["user_id"]))
+    log = cursor.fetchone()
+
+    if not log:
+        return jsonify({"error": "Not found"}), 404
+
+    return jsonify(log)
+
+@app.route("/api/food-log")
+def api_food_log():
+    """
+    Streams the user's food log, newest first.
+    ?format=ndjson|json  ?date=  ?cursor=  ?limit=  ?detail=1 (all columns)
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "json"):
+        return jsonify({"error": "format must be ndjson or json"}), 400
+
+    try:
+        cursor_q = parse_log_cursor(request.args.get("cursor"))
+        limit = request.args.get("limit")
+        # no limit streams the whole history
+        if limit:
+            limit = min(max(int(limit), 1), FOOD_LOG_STREAM_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor/limit"}), 400
+
+    columns = ["*"] if request.args.get("detail") == "1" else FOOD_LOG_LIST_COLUMNS
+    sql, params = food_log_query(
+        session["user_id"], columns,
+        date_q=request.args.get("date"), cursor=cursor_q, limit=limit
+    )
+
+    # unbuffered cursor: rows come off the socket as they are sent
+    db = get_db()
+    cursor = db.cursor(dictionary=True, buffered=False)
+    cursor.execute(sql, params)
+
+    def generate():
+        try:
+            if fmt == "json":
+                yield "["
+            for i, row in enumerate(cursor):
+                line = app.json.dumps(row)
+                if fmt == "json":
+                    yield ("," if i else "") + line
+                else:
+                    yield line + "\n"
+            if fmt == "json":
+                yield "]"
+        finally:
+            # client went away mid-stream: drain so the connection is reusable
+            db.consume_results()
+            cursor.close()
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return app.response_class(stream_with_context(generate()), mimetype=mimetype)
+
+# EXPORT / IMPORT FOOD LOG
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@app.route("/api/food-log/export")
+def api_food_log_export():
+    """
+    Full history as a download, oldest first. ?format=csv|ndjson ?from= ?to=
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    try:
+        date_from = date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        date_to = date.fromisoformat(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+
+    db = get_db()
+    cursor = db.cursor(dictionary=True, buffered=False)
+    cursor.execute(*food_log_io.export_query(session["user_id"], date_from, date_to))
+
+    def generate():
+        try:
+            yield from food_log_io.export_lines(cursor, fmt)
+        finally:
+            db.consume_results()
+            cursor.close()
+
+    filename = f"nutrimind-food-log-{date.today().isoformat()}.{fmt}"
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.route("/api/food-log/import", methods=["POST"])
+def api_food_log_import():
+    """
+    Bulk import from a CSV / NDJSON file (multipart "file" field or raw
+    body, ?format=csv|ndjson). Rows need food_name, optionally log_date;
+    rows without nutrient columns are resolved through the food catalog.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.mimetype == "multipart/form-data":
+        file = request.files.get("file")
+        if not file:
+            return jsonify({"error": "No file"}), 400
+        stream = file.stream
+        default_fmt = "ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv"
     else:
-        cursor.execute("""
-            SELECT * FROM food_logs
-            WHERE user_id=%s
-            ORDER BY created_at DESC
-        """, (session["user_id"],))
+        stream = request.stream
+        default_fmt = "ndjson" if request.mimetype == "application/x-ndjson" else "csv"
 
-    logs = cursor.fetchall()
-    return render_template("food-log.html", logs=logs)
+    fmt = request.args.get("format", default_fmt)
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    result = food_log_io.import_logs(
+        get_db(), session["user_id"],
+        food_log_io.read_records(stream, fmt),
+        first_line=2 if fmt == "csv" else 1
+    )
+
+    return jsonify(result), 400 if "error" in result else 200
 
 # MEAL PLAN
 @app.route("/meal-plan")
@@ -498,52 +812,93 @@ def mealplan():
 
     return render_template("meal-plan.html", meal_plan=meal_plan)
 
+MEAL_PLAN_COLORS = {
+    "Breakfast": "orange",
+    "Lunch": "blue",
+    "Dinner": "green",
+    "Snack": "purple"
+}
+
+def meal_plans_query(user_id, before=None, limit=20):
+    """
+    Keyset page of plans, newest first; before is exclusive
+    """
+    where = ["user_id=%s"]
+    params = [user_id]
+
+    if before:
+        where.append("plan_date < %s")
+        params.append(before)
+
+    return f"""
+        SELECT * FROM meal_plans
+        WHERE {" AND ".join(where)}
+        ORDER BY plan_date DESC
+        LIMIT %s
+    """, (*params, limit)
+
+
+def meal_plan_meals_query(plan_ids):
+    """
+    Meals + items of these plans in one query
+    """
+    return f"""
+        SELECT m.id, m.plan_id, m.meal_type, m.title, m.description,
+               m.calories, i.item_name
+        FROM meal_plan_meals m
+        LEFT JOIN meal_plan_items i ON i.meal_id=m.id
+        WHERE m.plan_id IN ({",".join(["%s"] * len(plan_ids))})
+        ORDER BY m.id
+    """, tuple(plan_ids)
+
+
 @app.route("/api/meal-plans")
 def api_meal_plans():
     if "user_id" not in session:
         return jsonify([])
 
+    # keyset pagination: ?before=YYYY-MM-DD (exclusive) &limit=N
+    before = request.args.get("before")
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+        if before:
+            before = datetime.strptime(before, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid before/limit"}), 400
+
     db = get_db()
     cursor = db.cursor(dictionary=True)
 
-    cursor.execute("""
-        SELECT * FROM meal_plans
-        WHERE user_id=%s
-        ORDER BY plan_date DESC
-    """, (session["user_id"],))
+    cursor.execute(*meal_plans_query(session["user_id"], before, limit + 1))
     plans = cursor.fetchall()
 
+    has_more = len(plans) > limit
+    plans = plans[:limit]
+
+    # meals + items for the whole page in one query
+    meals_by_plan = {plan["id"]: [] for plan in plans}
+    if plans:
+        cursor.execute(*meal_plan_meals_query(list(meals_by_plan)))
+
+        meals = {}
+        for row in cursor.fetchall():
+            meal = meals.get(row["id"])
+            if meal is None:
+                meal = meals[row["id"]] = {
+                    "type": row["meal_type"],
+                    "title": row["title"],
+                    "desc": row["description"],
+                    "calories": row["calories"],
+                    "items": [],
+                    "color": MEAL_PLAN_COLORS.get(row["meal_type"], "gray")
+                }
+                meals_by_plan[row["plan_id"]].append(meal)
+            if row["item_name"] is not None:
+                meal["items"].append(row["item_name"])
+
     results = []
 
     for plan in plans:
-        cursor.execute("""
-            SELECT * FROM meal_plan_meals
-            WHERE plan_id=%s
-        """, (plan["id"],))
-        meals = cursor.fetchall()
-
-        meal_list = []
-        for m in meals:
-            cursor.execute("""
-                SELECT item_name FROM meal_plan_items
-                WHERE meal_id=%s
-            """, (m["id"],))
-            items = [i["item_name"] for i in cursor.fetchall()]
-
-            meal_list.append({
-                "type": m["meal_type"],
-                "title": m["title"],
-                "desc": m["description"],
-                "calories": m["calories"],
-                "items": items,
-                "color": {
-                    "Breakfast": "orange",
-                    "Lunch": "blue",
-                    "Dinner": "green",
-                    "Snack": "purple"
-                }.get(m["meal_type"], "gray")
-            })
-
         results.append({
             "date": plan["plan_date"].strftime("%Y-%m-%d"),
             "summary": {
@@ -552,10 +907,13 @@ def api_meal_plans():
                 "carbs": plan["carbs"],
                 "fat": plan["fat"]
             },
-            "meals": meal_list
+            "meals": meals_by_plan[plan["id"]]
         })
 
-    return jsonify(results)
+    res = jsonify(results)
+    if has_more:
+        res.headers["X-Next-Before"] = results[-1]["date"]
+    return res
 
 # REPORTS
 @app.route("/reports")
@@ -564,6 +922,12 @@ def reports():
         return redirect("/")
     return render_template("reports.html")
 
+WEEKLY_REPORT_SQL = """
+    SELECT log_date, log_count, caloric_value, protein, carbohydrates, fat
+    FROM daily_nutrient_rollups
+    WHERE user_id=%s AND log_date BETWEEN %s AND %s
+"""
+
 @app.route("/api/reports/weekly")
 def api_weekly_report():
     if "user_id" not in session:
@@ -575,37 +939,47 @@ def api_weekly_report():
     today = date.today()
     monday = today - timedelta(days=today.weekday())
 
+    c.execute(WEEKLY_REPORT_SQL, (session["user_id"], monday, monday + timedelta(days=6)))
+    days = {row["log_date"]: row for row in c.fetchall()}
+
     data = []
     for i in range(7):
         d = monday + timedelta(days=i)
-        c.execute("""
-            SELECT COALESCE(SUM(caloric_value),0) calories
-            FROM food_logs
-            WHERE user_id=%s AND log_date=%s
-        """, (session["user_id"], d))
-
         data.append({
             "day": d.strftime("%a"),
-            "calories": c.fetchone()["calories"]
+            "calories": days[d]["caloric_value"] if d in days else 0
         })
 
-    # macros average
-    c.execute("""
-        SELECT
-          COALESCE(AVG(protein),0) protein,
-          COALESCE(AVG(carbohydrates),0) carbs,
-          COALESCE(AVG(fat),0) fat
-        FROM food_logs
-        WHERE user_id=%s AND log_date BETWEEN %s AND %s
-    """, (session["user_id"], monday, monday + timedelta(days=6)))
-
-    macros = c.fetchone()
+    # macros average per logged food, as AVG() over food_logs
+    logs = sum(row["log_count"] for row in days.values())
+    macros = {
+        key: sum(row[col] for row in days.values()) / logs if logs else 0
+        for key, col in (("protein", "protein"), ("carbs", "carbohydrates"), ("fat", "fat"))
+    }
 
     return jsonify({
         "daily": data,
         "macros": macros
     })
 
+def mysql_week(d):
+    """
+    WEEK(d, 1): Monday-first, week 1 = first week with 4+ days this year
+    """
+    iso_year, iso_week, _ = d.isocalendar()
+    if iso_year < d.year:
+        return 0
+    if iso_year > d.year:
+        return 53
+    return iso_week
+
+MONTHLY_REPORT_SQL = """
+    SELECT log_date, log_count, caloric_value
+    FROM daily_nutrient_rollups
+    WHERE user_id=%s AND log_date >= %s
+    ORDER BY log_date
+"""
+
 @app.route("/api/reports/monthly")
 def api_monthly_report():
     if "user_id" not in session:
@@ -617,18 +991,158 @@ def api_monthly_report():
     today = date.today()
     first_day = today.replace(day=1)
 
-    c.execute("""
-        SELECT
-          WEEK(log_date,1) week,
-          SUM(caloric_value) calories,
-          COUNT(*) logs
-        FROM food_logs
-        WHERE user_id=%s AND log_date >= %s
-        GROUP BY week
-        ORDER BY week
-    """, (session["user_id"], first_day))
-
-    return jsonify(c.fetchall())
+    # daily rollup rows (range scan on the primary key), grouped here
+    c.execute(MONTHLY_REPORT_SQL, (session["user_id"], first_day))
+
+    weeks = {}
+    for row in c.fetchall():
+        week = mysql_week(row["log_date"])
+        w = weeks.setdefault(week, {"week": week, "calories": 0, "logs": 0})
+        w["calories"] += row["caloric_value"]
+        w["logs"] += row["log_count"]
+
+    return jsonify([weeks[w] for w in sorted(weeks)])
+
+# /api/reports/range?from=2024-01-01&to=2024-06-30&granularity=week&nutrients=protein,fat
+REPORT_DEFAULT_NUTRIENTS = ["caloric_value", "protein", "carbohydrates", "fat"]
+
+@app.route("/api/reports/range")
+def api_range_report():
+    if "user_id" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+
+    try:
+        start = date.fromisoformat(request.args["from"])
+        end = date.fromisoformat(request.args.get("to") or date.today().isoformat())
+    except (KeyError, ValueError):
+        return jsonify({"error": "from / to must be YYYY-MM-DD dates"}), 400
+    if end < start:
+        return jsonify({"error": "to is before from"}), 400
+
+    granularity = request.args.get("granularity", "day")
+    if granularity not in analytics.GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(analytics.GRANULARITIES)}"}), 400
+
+    names = request.args.get("nutrients")
+    columns = []
+    for name in names.split(",") if names else REPORT_DEFAULT_NUTRIENTS:
+        col = name.strip().lower().replace(" ", "_")
+        if col not in NUTRIENT_COLUMNS:
+            return jsonify({"error": f"unknown nutrient: {name}"}), 400
+        if col not in columns:
+            columns.append(col)
+
+    if analytics.bucket_count(start, end, granularity) > analytics.MAX_BUCKETS:
+        return jsonify({"error": f"range is limited to {analytics.MAX_BUCKETS} {granularity}s"}), 400
+
+    series = analytics.nutrient_series(get_db(), session["user_id"], start, end, granularity, columns)
+
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "granularity": granularity,
+        "nutrients": columns,
+        "series": series
+    })
+
+@app.cli.command("backfill-rollups")
+@click.option("--user-id", type=int, default=None)
+def backfill_rollups_command(user_id):
+    """Rebuild daily_nutrient_rollups from food_logs."""
+    rows = backfill_rollups(get_db(), user_id)
+    if user_id is None:
+        analytics.get_report_cache().clear()
+    else:
+        analytics.invalidate(user_id)
+    click.echo(f"{rows} rollup rows written")
+
+# SCHEMA
+@app.cli.command("migrate")
+def migrate_command():
+    """Create / update the database schema (migrations.py)."""
+    applied = migrations.migrate(get_db(), log=click.echo)
+    click.echo(f"{applied} migrations applied")
+
+def hot_queries(user_id, day):
+    """
+    The per-request queries of the routes above, with sample parameters;
+    built from the same SQL constants / builders the routes run
+    """
+    monday = day - timedelta(days=day.weekday())
+    cursor_q = (datetime.combine(day, datetime.min.time()), 1)
+
+    return [
+        ("login", LOGIN_SQL, ("a@b.c",)),
+        ("dashboard rollups", DASHBOARD_ROLLUPS_SQL, (user_id, monday, monday + timedelta(days=6))),
+        ("dashboard meals", DASHBOARD_MEALS_SQL, (user_id, day, user_id, day)),
+        ("food log page", *food_log_query(
+            user_id, FOOD_LOG_LIST_COLUMNS, limit=FOOD_LOG_PAGE_SIZE + 1)),
+        ("food log page by date", *food_log_query(
+            user_id, FOOD_LOG_LIST_COLUMNS, date_q=day, limit=FOOD_LOG_PAGE_SIZE + 1)),
+        ("food log next page", *food_log_query(
+            user_id, FOOD_LOG_LIST_COLUMNS, cursor=cursor_q, limit=FOOD_LOG_PAGE_SIZE + 1)),
+        ("food log detail", FOOD_LOG_DETAIL_SQL, (1, user_id)),
+        ("food log export", *food_log_io.export_query(user_id, day - timedelta(days=90), day)),
+        ("meal plans page", *meal_plans_query(user_id, limit=21)),
+        ("meal plans older page", *meal_plans_query(user_id, before=day, limit=21)),
+        ("meal plan meals", *meal_plan_meals_query([1, 2])),
+        ("weekly report", WEEKLY_REPORT_SQL, (user_id, monday, monday + timedelta(days=6))),
+        ("monthly report", MONTHLY_REPORT_SQL, (user_id, day.replace(day=1))),
+        ("range report", *analytics.series_query(user_id, day - timedelta(days=365), day))
+    ]
+
+@app.cli.command("check-queries")
+@click.option("--user-id", type=int, default=1, help="user to take sample parameters for")
+@click.option("--min-rows", type=int, default=migrations.CHECK_MIN_ROWS, show_default=True,
+              help="refuse to judge plans if a table has fewer rows (0: check anyway)")
+@click.option("--analyze", is_flag=True, help="ANALYZE TABLE first (after loading data)")
+def check_queries_command(user_id, min_rows, analyze):
+    """EXPLAIN the hot queries; fail if any reads a whole table.
+
+    MySQL picks full scans on small tables whatever the indexes, so the
+    plans only mean something on production-sized data. In CI, run it
+    against a database loaded with a production snapshot or seeded
+    fixture data (every table at least --min-rows rows):
+
+    \b
+        flask migrate
+        <load the snapshot / fixtures>
+        flask check-queries --analyze --user-id <a user with logs>
+
+    Exit status: 0 ok, 1 a query reads a whole table, 2 tables too small
+    to tell.
+    """
+    queries = hot_queries(user_id, date.today())
+    tables = list(dict.fromkeys(
+        table for _, sql, _ in queries for table in migrations.query_tables(sql)
+    ))
+
+    c = get_db().cursor()
+    if analyze:
+        migrations.analyze_tables(c, tables)
+
+    small = {
+        table: rows for table, rows in migrations.table_rows(c, tables).items()
+        if rows < min_rows
+    }
+    if small:
+        for table, rows in small.items():
+            click.echo(f"TOO SMALL  {table}: {rows} rows (< {min_rows})")
+        click.echo("plans on tables this small don't reflect production; load more data "
+                   "or pass --min-rows 0 to see them anyway")
+        raise SystemExit(2)
+
+    failed = 0
+    for name, sql, params in queries:
+        problems = migrations.explain_problems(c, sql, params)
+        if problems:
+            failed += 1
+            click.echo(f"FULL SCAN  {name}: " + "; ".join(problems))
+        else:
+            click.echo(f"ok         {name}")
+
+    if failed:
+        raise SystemExit(1)
 
 # LOGOUT
 @app.route("/logout")
@@ -0,0 +1,221 @@
+"""
+Microbenchmarks for the food-matching and meal-engine hot paths, on the
+bundled catalog and on synthetic catalogs scaled from it (10x, 100x):
+
+  build         CSVs -> compiled artifact (what the first worker pays)
+  cold load     open the mmap'd artifact + first lookup
+  match         FoodCatalog.match, cold cache / warm cache
+  match_many    one batch of queries, cold cache
+  row           CompiledCatalog.row (nutrient row -> dict)
+  meal plan     generate_meal_plan with a stubbed recommend_meals
+                ("llm" mode), and the local planner
+
+Runs offline. Run from the repo root:
+    python benchmarks/bench_hot_paths.py [--scales 1,10,100] [--repeat 7]
+    python benchmarks/bench_hot_paths.py --json before.json
+    python benchmarks/bench_hot_paths.py --compare before.json
+
+Every number is the median of --repeat runs (min in brackets), with a
+fixed seed and the GC off while timing, so runs are comparable.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# openai_meal_ai builds its client at import; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import numpy as np  # noqa: E402
+
+import food_catalog  # noqa: E402
+import meal_engine  # noqa: E402
+from bench_name_index import make_queries, synthetic_names  # noqa: E402
+from food_catalog import (  # noqa: E402
+    FoodCatalog, build_artifact, open_artifact, read_food_csvs
+)
+
+DEFAULT_SCALES = "1,10,100"
+
+PROFILE = {
+    "age": 30,
+    "gender": "female",
+    "weight": 62,
+    "height": 165,
+    "activity": "Moderately Active",
+    "preferences": []
+}
+
+
+def timed(fn, repeat):
+    """
+    → (median ms, min ms) over `repeat` calls, after one warm-up
+    """
+    fn()
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    return statistics.median(samples), min(samples)
+
+
+def write_synthetic_data(df, scale, data_dir, rng):
+    """
+    scale x the bundled rows: names built from the real token vocabulary,
+    nutrients resampled from real rows with +-20% jitter
+    """
+    if scale == 1:
+        out = df
+    else:
+        size = len(df) * scale
+        picks = np.random.default_rng(rng.randrange(1 << 32)).integers(len(df), size=size)
+
+        out = df.iloc[picks].reset_index(drop=True)
+        numeric = [c for c in out.columns if c != "food"]
+        jitter = np.random.default_rng(rng.randrange(1 << 32)).uniform(
+            0.8, 1.2, size=(size, len(numeric))
+        )
+        out[numeric] = (out[numeric].to_numpy(dtype=np.float64) * jitter).round(3)
+        out["food"] = synthetic_names(df["food"].tolist(), size, rng)
+
+    os.makedirs(data_dir, exist_ok=True)
+    out.to_csv(os.path.join(data_dir, "FOOD-DATA-SYNTHETIC.csv"), index=False)
+
+
+def stub_recommendations(base, rng):
+    """
+    what recommend_meals returns, minus the network: 3 foods per meal,
+    a mix of exact names and the usual LLM/vision spelling drift
+    """
+    queries = make_queries(base, 12, rng)
+    return {
+        meal: queries[i * 3:(i + 1) * 3]
+        for i, meal in enumerate(["breakfast", "lunch", "dinner", "snack"])
+    }
+
+
+def bench_scale(df, scale, args, rng, workdir):
+    data_dir = os.path.join(workdir, f"data-x{scale}")
+    catalog_dir = os.path.join(data_dir, ".catalog")
+    write_synthetic_data(df, scale, data_dir, rng)
+
+    results = {}
+
+    def build():
+        shutil.rmtree(catalog_dir, ignore_errors=True)
+        build_artifact(data_dir, catalog_dir)
+
+    results["build"] = timed(build, max(1, args.repeat // 3))
+
+    path = build_artifact(data_dir, catalog_dir)
+    results["cold load"] = timed(lambda: open_artifact(path).lookup("apple"), args.repeat)
+
+    catalog = FoodCatalog(data_dir, catalog_dir)
+    names = catalog.names
+    queries = make_queries(names, args.queries, rng)
+
+    def match_cold():
+        catalog._load()[1].clear()
+        for q in queries:
+            catalog.match(q)
+
+    def match_warm():
+        for q in queries:
+            catalog.match(q)
+
+    def match_many_cold():
+        catalog._load()[1].clear()
+        catalog.match_many(queries)
+
+    per_query = 1 / len(queries)
+    results["match cold /q"] = tuple(t * per_query for t in timed(match_cold, args.repeat))
+    match_warm()
+    results["match warm /q"] = tuple(t * per_query for t in timed(match_warm, args.repeat))
+    results["match_many /q"] = tuple(t * per_query for t in timed(match_many_cold, args.repeat))
+
+    compiled = catalog.compiled
+    rows = [rng.randrange(len(compiled)) for _ in range(1000)]
+    results["row /1k"] = timed(lambda: [compiled.row(i) for i in rows], args.repeat)
+
+    stub = stub_recommendations(names, rng)
+    original = meal_engine.recommend_meals, meal_engine.get_catalog
+    meal_engine.recommend_meals = lambda form: stub
+    meal_engine.get_catalog = lambda: catalog
+    try:
+        def plan_llm():
+            catalog._load()[1].clear()
+            meal_engine.generate_meal_plan(dict(PROFILE, mode="llm"))
+
+        results["meal plan llm"] = timed(plan_llm, args.repeat)
+        results["meal plan local"] = timed(
+            lambda: meal_engine.generate_meal_plan(dict(PROFILE, mode="local")),
+            args.repeat
+        )
+    finally:
+        meal_engine.recommend_meals, meal_engine.get_catalog = original
+
+    return len(compiled), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    df = read_food_csvs(food_catalog.DATA_DIR)
+    df = df[["food"] + [
+        c for c in df.columns if c != "food" and not c.startswith("unnamed")
+    ]]
+
+    workdir = tempfile.mkdtemp(prefix="nutrimind-bench-")
+    report = {}
+
+    try:
+        for scale in [int(s) for s in args.scales.split(",")]:
+            # same data and queries per scale no matter which scales run
+            rng = random.Random(args.seed + scale)
+            rows, results = bench_scale(df, scale, args, rng, workdir)
+
+            print(f"\nx{scale} ({rows} foods)")
+            for name, (median, best) in results.items():
+                line = f"  {name:<16} {median:>10.3f} ms  [{best:.3f}]"
+                before = baseline.get(f"x{scale}", {}).get(name)
+                if before:
+                    line += f"  {(median - before[0]) / before[0]:+7.1%} vs {before[0]:.3f}"
+                print(line)
+
+            report[f"x{scale}"] = results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-query latency of FoodCatalog.match's fuzzy step as the catalog grows:
+full extractOne scan vs NameIndex candidate pruning.
+
+Run from the repo root:
+    python benchmarks/bench_name_index.py [--queries 200] [--sizes 2400,10000,...]
+
+Every query is checked to return the same winner as the full scan.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import process, fuzz  # noqa: E402
+from food_catalog import NameIndex, load_catalog  # noqa: E402
+
+SCORE_CUTOFF = 75
+DEFAULT_SIZES = "2400,10000,25000,50000,100000,200000"
+
+
+def synthetic_names(base, size, rng):
+    """
+    base names + variants built from the same token vocabulary,
+    so length/character distribution stays realistic
+    """
+    vocab = sorted({tok for name in base for tok in name.split()})
+    names = list(base)
+
+    while len(names) < size:
+        tokens = rng.choice(base).split()
+        op = rng.random()
+        if op < 0.4:
+            tokens.append(rng.choice(vocab))
+        elif op < 0.8 and len(tokens) > 1:
+            tokens[rng.randrange(len(tokens))] = rng.choice(vocab)
+        else:
+            tokens.insert(0, rng.choice(vocab))
+        names.append(" ".join(tokens))
+
+    return names[:size]
+
+
+def make_queries(base, count, rng):
+    """
+    what reaches match_food in practice: exact names, reordered words,
+    vision-style short names, typos and things not in the catalog
+    """
+    queries = []
+    for _ in range(count):
+        name = rng.choice(base)
+        tokens = name.split()
+        op = rng.random()
+        if op < 0.25:
+            queries.append(name)
+        elif op < 0.5:
+            rng.shuffle(tokens)
+            queries.append(" ".join(tokens))
+        elif op < 0.7:
+            queries.append(" ".join(tokens[:2]))
+        elif op < 0.9 and len(name) > 4:
+            i = rng.randrange(len(name) - 1)
+            queries.append(name[:i] + name[i + 1:])
+        else:
+            queries.append(f"{rng.choice(tokens)} {rng.choice(['bowl', 'plate', 'xyz'])}")
+    return queries
+
+
+def per_query_ms(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = load_catalog().names
+    queries = make_queries(base, args.queries, rng)
+
+    print(f"{'names':>8} {'build ms':>9} {'full ms/q':>10} "
+          f"{'pruned ms/q':>12} {'avg cands':>10} {'speedup':>8}")
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        names = synthetic_names(base, size, rng)
+
+        start = time.perf_counter()
+        index = NameIndex(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        full, full_ms = per_query_ms(
+            lambda q: process.extractOne(
+                q, names, scorer=fuzz.token_sort_ratio, score_cutoff=SCORE_CUTOFF
+            ),
+            queries
+        )
+        pruned, pruned_ms = per_query_ms(
+            lambda q: index.extract_one(q, SCORE_CUTOFF), queries
+        )
+
+        for q, a, b in zip(queries, full, pruned):
+            same = (a is None and b is None) or (
+                a is not None and b is not None and a[2] == b[2] and a[1] == b[1]
+            )
+            if not same:
+                raise SystemExit(f"mismatch for {q!r}: {a} vs {b}")
+
+        avg_cands = sum(
+            len(index.candidates(" ".join(sorted(q.split())), SCORE_CUTOFF))
+            for q in queries
+        ) / len(queries)
+
+        print(f"{size:>8} {build_ms:>9.1f} {full_ms:>10.3f} "
+              f"{pruned_ms:>12.3f} {avg_cands:>10.0f} {full_ms / pruned_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,3 +5,64 @@ MYSQL_CONFIG = {
     "database": "nutrimind",
     "port": 3306
 }
+
+# connection pool per worker process (database.get_db)
+MYSQL_POOL = {
+    "pool_size": 10,          # mysql-connector allows at most 32
+    "acquire_timeout": 5,     # seconds a request waits for a free connection
+    "connect_timeout": 5,     # seconds for the TCP + auth handshake
+    "health_check": True      # ping (reconnect if needed) before handing out
+}
+
+# food name matching (food_catalog.FoodCatalog)
+FOOD_MATCH_SCORE_CUTOFF = 75
+FOOD_MATCH_CACHE_SIZE = 4096
+
+# nutrient-similarity neighbors precomputed per food after the catalog
+# build (FoodCatalog.similar); larger k falls back to a full scan
+FOOD_SIMILAR_NEIGHBORS = 32
+
+# perceptual-hash cache in front of vision.analyze_food_image
+VISION_CACHE = {
+    "path": "data/.vision_cache.sqlite3",
+    "max_distance": 6,        # Hamming distance (of 64 bits) still "same photo"
+    "max_entries": 5000       # least recently used entries are evicted past this
+}
+
+# closed-period report buckets (analytics.py), shared by the workers
+REPORT_CACHE = {
+    "path": "data/.report_cache.sqlite3",
+    "max_entries": 200000,    # oldest buckets are evicted past this
+    "evict_interval": 600     # seconds between size sweeps
+}
+
+# external AI calls (upstream.py)
+UPSTREAM = {
+    "max_workers": 8,         # concurrent OpenAI calls per worker process
+    "vision_timeout": 20,     # seconds, /api/scan-food
+    "meal_plan_timeout": 30   # seconds, /api/generate-meal-plan
+}
+
+# pre-generated daily tips (tip_pool.py)
+TIP_POOL = {
+    "path": "data/.tip_pool.json",
+    "tips_per_combo": 3,          # per TIP_CATEGORIES x TIP_STYLES pair
+    "refill_interval": 6 * 3600,  # seconds between background refill passes
+    "max_age_days": 30            # tips are rotated out (regenerated) after this
+}
+
+# server-side sessions (session_store.py): the cookie only holds the id
+SESSION_STORE = {
+    "backend": "sqlite",                    # "sqlite" (shared by workers) or "memory" (dev, one worker)
+    "path": "data/.sessions.sqlite3",
+    "ttl": 7 * 24 * 3600,                   # seconds since last write / refresh
+    "evict_interval": 3600                  # seconds between expired-session sweeps
+}
+
+# request metrics (metrics.py, served on /metrics)
+METRICS = {
+    "slow_request_seconds": 1.0   # requests slower than this are logged with their query count
+}
+
+# meal plan generation: "llm" (OpenAI suggestions) or "local" (meal_planner.py)
+MEAL_PLAN_MODE = "llm"
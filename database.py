@@ -1,5 +1,136 @@
+import threading
 import mysql.connector
-from config import MYSQL_CONFIG
+from mysql.connector import pooling
+from flask import g, has_app_context, jsonify
+from config import MYSQL_CONFIG, MYSQL_POOL
+from metrics import CountingConnection
+
+
+# nutrient columns of food_logs; the catalog key is the same name
+# with spaces ("caloric_value" <- "caloric value")
+NUTRIENT_COLUMNS = [
+    "caloric_value", "fat", "saturated_fats",
+    "monounsaturated_fats", "polyunsaturated_fats",
+    "carbohydrates", "sugars", "protein", "dietary_fiber",
+    "cholesterol", "sodium", "water",
+    "vitamin_a", "vitamin_b1", "vitamin_b11", "vitamin_b12",
+    "vitamin_b2", "vitamin_b3", "vitamin_b5", "vitamin_b6",
+    "vitamin_c", "vitamin_d", "vitamin_e", "vitamin_k",
+    "calcium", "copper", "iron", "magnesium", "manganese",
+    "phosphorus", "potassium", "selenium", "zinc",
+    "nutrition_density"
+]
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MYSQL_POOL["pool_size"])
+
+_stats = {
+    "acquired": 0,
+    "in_use": 0,
+    "waits": 0,
+    "timeouts": 0,
+    "health_check_failures": 0
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _get_pool():
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="nutrimind",
+                    pool_size=MYSQL_POOL["pool_size"],
+                    pool_reset_session=True,
+                    connection_timeout=MYSQL_POOL["connect_timeout"],
+                    **MYSQL_CONFIG
+                )
+    return _pool
+
+
+def _acquire():
+    # mysql-connector raises instead of waiting when the pool is empty,
+    # so free slots are counted here and callers wait on the semaphore
+    if not _slots.acquire(blocking=False):
+        _count("waits")
+        if not _slots.acquire(timeout=MYSQL_POOL["acquire_timeout"]):
+            _count("timeouts")
+            raise PoolTimeout("no free database connection")
+
+    try:
+        conn = _get_pool().get_connection()
+        if MYSQL_POOL["health_check"]:
+            try:
+                conn.ping(reconnect=True, attempts=1, delay=0)
+            except mysql.connector.Error:
+                _count("health_check_failures")
+                conn.close()
+                raise
+    except Exception:
+        _slots.release()
+        raise
+
+    _count("acquired")
+    _count("in_use")
+    return conn
+
 
 def get_db():
-    return mysql.connector.connect(**MYSQL_CONFIG)
+    """
+    Pooled connection for the current request (same one on every call,
+    returned to the pool by close_db). Outside a request, e.g. in
+    scripts, a plain connection the caller has to close.
+    """
+    if not has_app_context():
+        return mysql.connector.connect(**MYSQL_CONFIG)
+
+    if "db" not in g:
+        # cursors count their queries into the request metrics
+        g.db = CountingConnection(_acquire())
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+
+    try:
+        if exc is not None:
+            conn.rollback()
+    except mysql.connector.Error:
+        pass
+
+    try:
+        conn.close()
+    finally:
+        _count("in_use", -1)
+        _slots.release()
+
+
+def pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["pool_size"] = MYSQL_POOL["pool_size"]
+    return stats
+
+
+def init_db(app):
+    app.teardown_appcontext(close_db)
+
+    @app.errorhandler(PoolTimeout)
+    def pool_timeout(e):
+        return jsonify({"error": "Database busy"}), 503
@@ -0,0 +1,695 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import process, fuzz
+from config import FOOD_MATCH_CACHE_SIZE, FOOD_MATCH_SCORE_CUTOFF, FOOD_SIMILAR_NEIGHBORS
+from food_query import NutrientIndex
+from food_similarity import SimilarityIndex, compute_neighbors
+import metrics
+
+DATA_DIR = "data"
+CATALOG_DIR = os.path.join(DATA_DIR, ".catalog")
+
+# bump when the artifact layout changes, so old builds are ignored
+FORMAT_VERSION = 3
+
+# CSV values carry at most 3 decimals, so float32 -> round(3) gives them back exactly
+DECIMALS = 3
+
+
+class CompiledCatalog:
+    """
+    Food catalog compiled for lookups:
+    names list, name -> row index map, float32 nutrient matrix,
+    precomputed nutrient neighbors (rows x k) once they are built
+    """
+
+    def __init__(self, names, columns, matrix, neighbors=None, neighbor_scores=None):
+        self.names = names
+        self.columns = columns
+        self.matrix = matrix
+        self.neighbors = neighbors
+        self.neighbor_scores = neighbor_scores
+
+        self._name_index = None
+        self._similarity = None
+        self._nutrient_index = None
+        self._lock = threading.Lock()
+
+        self.index = {}
+        for i, name in enumerate(names):
+            # first occurrence wins, same as df[df["food"] == name].iloc[0]
+            self.index.setdefault(name, i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, i):
+        values = self.matrix[i].astype(np.float64).round(DECIMALS).tolist()
+        data = {"food": self.names[i]}
+        data.update(zip(self.columns, values))
+        return data
+
+    def lookup(self, name):
+        i = self.index.get(name)
+        if i is None:
+            return None
+        return self.row(i)
+
+    @property
+    def name_index(self):
+        # built on first fuzzy lookup, not on load
+        if self._name_index is None:
+            with self._lock:
+                if self._name_index is None:
+                    self._name_index = NameIndex(self.names)
+        return self._name_index
+
+    @property
+    def neighbors_ready(self):
+        return self.neighbors is not None
+
+    def attach_neighbors(self, neighbors, neighbor_scores):
+        # neighbors are built after load (see FoodCatalog._start_neighbors)
+        with self._lock:
+            self.neighbors = neighbors
+            self.neighbor_scores = neighbor_scores
+            self._similarity = None
+
+    @property
+    def similarity(self):
+        # built on first similarity lookup, not on load
+        if self._similarity is None:
+            with self._lock:
+                if self._similarity is None:
+                    self._similarity = SimilarityIndex(
+                        self.matrix, self.neighbors, self.neighbor_scores
+                    )
+        return self._similarity
+
+    @property
+    def nutrient_index(self):
+        # per-column sorted indexes are built lazily inside
+        if self._nutrient_index is None:
+            with self._lock:
+                if self._nutrient_index is None:
+                    self._nutrient_index = NutrientIndex(self.matrix, self.columns)
+        return self._nutrient_index
+
+
+def normalize_query(food_name):
+    """
+    Lowercase + collapse whitespace. token_sort_ratio splits on
+    whitespace anyway, so this never changes which food wins.
+    """
+    return " ".join(food_name.lower().split())
+
+
+class MatchCache:
+    """
+    Bounded LRU: (normalized query, score cutoff) -> (matched row index
+    or None for "no match", score). Thread-safe.
+    """
+
+    MISSING = object()
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return self.MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def sort_tokens(name):
+    return " ".join(sorted(name.split()))
+
+
+class NameIndex:
+    """
+    Candidate pruning in front of token_sort_ratio.
+
+    token_sort_ratio(a, b) == ratio(sort_tokens(a), sort_tokens(b))
+                           == 200 * LCS / (len_a + len_b)
+    and LCS is bounded by both min(len_a, len_b) and the overlap of the
+    two character histograms. Names whose bound is below the cutoff can
+    never reach it, so they are dropped before scoring: the winner is
+    exactly the one a full extractOne scan would return.
+    """
+
+    # above this share of the catalog, a plain full scan is cheaper
+    MAX_CANDIDATE_SHARE = 0.5
+
+    def __init__(self, names):
+        self.names = names
+        self.sorted_names = [sort_tokens(name) for name in names]
+
+        lengths = np.fromiter(
+            (len(s) for s in self.sorted_names), dtype=np.int32, count=len(names)
+        )
+        # everything below is kept in length order, so the length window
+        # of a query is a contiguous slice
+        self.by_length = np.argsort(lengths, kind="stable")
+        self.sorted_lengths = lengths[self.by_length]
+
+        # character histogram per name, stored alphabet x names
+        text = "".join(self.sorted_names[i] for i in self.by_length.tolist())
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        alphabet, cols = np.unique(codes, return_inverse=True)
+        rows = np.repeat(np.arange(len(names)), self.sorted_lengths)
+
+        counts = np.bincount(
+            cols * len(names) + rows,
+            minlength=len(alphabet) * len(names)
+        ).reshape(len(alphabet), len(names))
+
+        self.alphabet = {chr(c): j for j, c in enumerate(alphabet.tolist())}
+        self.histograms = np.minimum(counts, 255).astype(np.uint8)
+
+    def candidates(self, query, score_cutoff):
+        """
+        Row indexes (catalog order) that can still score >= score_cutoff
+        against the already token-sorted query, or None when the bound
+        can't be applied
+        """
+        lq = len(query)
+        cutoff = score_cutoff - 1e-6
+
+        # 200 * min(lq, l) / (lq + l) >= cutoff
+        lo = lq * cutoff / (200 - cutoff)
+        hi = lq * (200 - cutoff) / cutoff
+        start = int(np.searchsorted(self.sorted_lengths, lo, side="left"))
+        stop = int(np.searchsorted(self.sorted_lengths, hi, side="right"))
+
+        q_counts = {}
+        for ch in query:
+            j = self.alphabet.get(ch)
+            if j is not None:
+                q_counts[j] = q_counts.get(j, 0) + 1
+
+        # histograms are clipped at 255, fine as long as the query is too
+        if q_counts and max(q_counts.values()) > 255:
+            return None
+
+        # characters missing from the query add nothing to the overlap
+        overlap = np.zeros(stop - start, dtype=np.int32)
+        for j, n in q_counts.items():
+            overlap += np.minimum(self.histograms[j, start:stop], n)
+
+        bound = 200.0 * overlap / (lq + self.sorted_lengths[start:stop])
+
+        return np.sort(self.by_length[start:stop][bound >= cutoff])
+
+    def extract_one(self, query, score_cutoff):
+        """
+        Same result as
+        process.extractOne(query, names, scorer=fuzz.token_sort_ratio,
+                           score_cutoff=score_cutoff)
+        -> (name, score, index) or None
+        """
+        query = sort_tokens(query)
+
+        if not query or score_cutoff <= 0:
+            return self._full_scan(query, score_cutoff)
+
+        cands = self.candidates(query, score_cutoff)
+        if cands is None or len(cands) > self.MAX_CANDIDATE_SHARE * len(self.names):
+            return self._full_scan(query, score_cutoff)
+
+        cands = cands.tolist()
+        match = process.extractOne(
+            query,
+            [self.sorted_names[i] for i in cands],
+            scorer=fuzz.ratio,
+            score_cutoff=score_cutoff
+        )
+        if not match:
+            return None
+
+        i = cands[match[2]]
+        return self.names[i], match[1], i
+
+    def _full_scan(self, query, score_cutoff):
+        match = process.extractOne(
+            query,
+            self.sorted_names,
+            scorer=fuzz.ratio,
+            score_cutoff=score_cutoff
+        )
+        if not match:
+            return None
+
+        i = match[2]
+        return self.names[i], match[1], i
+
+
+def csv_files(data_dir=DATA_DIR):
+    return sorted(
+        os.path.join(data_dir, f)
+        for f in os.listdir(data_dir)
+        if f.endswith(".csv")
+    )
+
+
+def data_hash(data_dir=DATA_DIR):
+    """
+    Content hash of the food CSVs (+ artifact format version)
+    """
+    h = hashlib.sha256(f"v{FORMAT_VERSION}".encode())
+    for path in csv_files(data_dir):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def read_food_csvs(data_dir=DATA_DIR):
+    # pandas is only needed to build the artifact, not to serve from it
+    import pandas as pd
+
+    dfs = []
+    for path in csv_files(data_dir):
+        df = pd.read_csv(path)
+        df.columns = [c.strip().lower() for c in df.columns]
+        dfs.append(df)
+
+    df = pd.concat(dfs, ignore_index=True)
+    df["food"] = df["food"].astype(str).str.lower()
+    return df
+
+
+def compile_catalog(df):
+    """
+    Convert the combined food DataFrame → CompiledCatalog
+    (drops the leftover "unnamed: 0" CSV index columns, NaN → 0)
+    """
+    import pandas as pd
+
+    columns = [
+        c for c in df.columns
+        if c != "food" and not c.startswith("unnamed")
+    ]
+
+    numeric = df[columns].apply(pd.to_numeric, errors="coerce").fillna(0)
+    matrix = np.ascontiguousarray(numeric.to_numpy(dtype=np.float32))
+
+    return CompiledCatalog(df["food"].tolist(), columns, matrix)
+
+
+def write_artifact(catalog, path, digest):
+    """
+    Artifact layout (one directory per data hash):
+      schema.json    columns, row count, hash
+      names.npy      fixed-width unicode array
+      nutrients.npy  float32 matrix, rows x columns
+
+    Neighbors are added to the same directory later, by build_neighbors.
+    """
+    np.save(os.path.join(path, "names.npy"), np.array(catalog.names, dtype=str))
+    np.save(os.path.join(path, "nutrients.npy"), catalog.matrix)
+
+    with open(os.path.join(path, "schema.json"), "w") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "hash": digest,
+            "rows": len(catalog),
+            "columns": catalog.columns
+        }, f)
+
+
+def open_artifact(path):
+    with open(os.path.join(path, "schema.json")) as f:
+        schema = json.load(f)
+
+    # mmap: workers share the pages instead of each holding a copy
+    matrix = np.load(os.path.join(path, "nutrients.npy"), mmap_mode="r")
+    names = np.load(os.path.join(path, "names.npy"), mmap_mode="r").tolist()
+
+    return CompiledCatalog(names, schema["columns"], matrix, *open_neighbors(path))
+
+
+def _neighbor_files(path, k):
+    return (
+        os.path.join(path, f"neighbors-k{k}.npy"),
+        os.path.join(path, f"neighbor_scores-k{k}.npy")
+    )
+
+
+def open_neighbors(path, k=FOOD_SIMILAR_NEIGHBORS):
+    """
+    → (neighbors, scores) mmap'd, or (None, None) if not built yet
+    """
+    neighbors_file, scores_file = _neighbor_files(path, k)
+    # neighbors file is renamed into place last: present means complete
+    if not os.path.exists(neighbors_file):
+        return None, None
+
+    return (
+        np.load(neighbors_file, mmap_mode="r"),
+        np.load(scores_file, mmap_mode="r")
+    )
+
+
+def build_neighbors(path, k=FOOD_SIMILAR_NEIGHBORS):
+    """
+    Add the k-nearest-neighbor index to the artifact at path
+    (no-op if already there):
+      neighbors-k<k>.npy        int32 rows x k most similar rows
+      neighbor_scores-k<k>.npy  their float32 cosine scores
+
+    O(rows^2): run it as a build step (python food_catalog.py) or off
+    the request path (FoodCatalog does it on a background thread).
+    An flock lets one process build while the others wait.
+    """
+    neighbors_file, scores_file = _neighbor_files(path, k)
+
+    with open(os.path.join(path, ".neighbors.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if os.path.exists(neighbors_file):
+            return path
+
+        matrix = np.load(os.path.join(path, "nutrients.npy"), mmap_mode="r")
+        neighbors, scores = compute_neighbors(matrix, k)
+
+        for target, array in ((scores_file, scores), (neighbors_file, neighbors)):
+            tmp = target + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.rename(tmp, target)
+
+    return path
+
+
+def build_artifact(data_dir=DATA_DIR, catalog_dir=CATALOG_DIR):
+    """
+    Compile the CSVs into catalog_dir/<hash>/ (no-op if already built).
+    Returns the artifact path.
+
+    The build takes a while on big catalogs, so an flock lets one
+    process build while the others wait and reuse it.
+    """
+    digest = data_hash(data_dir)
+    path = os.path.join(catalog_dir, digest)
+
+    if os.path.exists(os.path.join(path, "schema.json")):
+        return path
+
+    os.makedirs(catalog_dir, exist_ok=True)
+
+    with open(os.path.join(catalog_dir, ".build.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        # built by whoever held the lock before us
+        if os.path.exists(os.path.join(path, "schema.json")):
+            return path
+
+        tmp = tempfile.mkdtemp(prefix=".build-", dir=catalog_dir)
+        try:
+            write_artifact(compile_catalog(read_food_csvs(data_dir)), tmp, digest)
+            os.rename(tmp, path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        # drop artifacts of older data
+        for name in os.listdir(catalog_dir):
+            if name != digest and not name.startswith("."):
+                shutil.rmtree(os.path.join(catalog_dir, name), ignore_errors=True)
+
+    return path
+
+
+def load_catalog(data_dir=DATA_DIR, catalog_dir=CATALOG_DIR):
+    return open_artifact(build_artifact(data_dir, catalog_dir))
+
+
+class NeighborsNotReady(Exception):
+    pass
+
+
+class FoodCatalog:
+    """
+    The food catalog service: one per process (see get_catalog).
+    Lookups are thread-safe; reload() swaps catalog and match cache
+    together, so a lookup never mixes old row indexes with new data.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, catalog_dir=CATALOG_DIR,
+                 cache_size=FOOD_MATCH_CACHE_SIZE):
+        self.data_dir = data_dir
+        self.catalog_dir = catalog_dir
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _load(self):
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._open()
+                state = self._state
+        return state
+
+    def _open(self):
+        path = build_artifact(self.data_dir, self.catalog_dir)
+        compiled = open_artifact(path)
+        if not compiled.neighbors_ready:
+            self._start_neighbors(path, compiled)
+        return compiled, MatchCache(self.cache_size)
+
+    def _start_neighbors(self, path, compiled):
+        # similar() answers 503 (NeighborsNotReady) until this is done
+        def build():
+            try:
+                build_neighbors(path)
+                compiled.attach_neighbors(*open_neighbors(path))
+            except Exception as e:
+                print("CATALOG NEIGHBORS ERROR:", e)
+
+        threading.Thread(target=build, name="catalog-neighbors", daemon=True).start()
+
+    def reload(self):
+        """
+        Re-open the catalog (rebuilds the artifact if the CSVs changed)
+        with a fresh match cache, since row indexes may have moved
+        """
+        state = self._open()
+        with self._lock:
+            self._state = state
+
+    @property
+    def compiled(self):
+        return self._load()[0]
+
+    @property
+    def names(self):
+        return self.compiled.names
+
+    @property
+    def columns(self):
+        return self.compiled.columns
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def cache_stats(self):
+        return self._load()[1].stats()
+
+    def by_id(self, food_id):
+        compiled = self.compiled
+        if not 0 <= food_id < len(compiled):
+            return None
+        return compiled.row(food_id)
+
+    def exact(self, food_name):
+        return self.compiled.lookup(food_name.strip().lower())
+
+    def match(self, food_name, score_cutoff=FOOD_MATCH_SCORE_CUTOFF):
+        """
+        Best fuzzy match (token_sort_ratio >= score_cutoff) → nutrition dict or None
+        """
+        compiled, i = self._find(food_name, score_cutoff)
+        if i is None:
+            return None
+
+        return compiled.row(i)
+
+    def _find(self, food_name, score_cutoff):
+        # → (catalog, matched row index or None)
+        compiled, cache = self._load()
+
+        query = normalize_query(food_name)
+        key = (query, score_cutoff)
+
+        cached = cache.get(key)
+        if cached is MatchCache.MISSING:
+            # only cache misses are timed; hits are a dict lookup
+            with metrics.track("match"):
+                match = compiled.name_index.extract_one(query, score_cutoff)
+            # no match scores 0, as cdist reports it in _find_many
+            cached = (match[2], match[1]) if match else (None, 0.0)
+            cache.put(key, cached)
+
+        return compiled, cached[0]
+
+    def match_many(self, food_names, score_cutoff=FOOD_MATCH_SCORE_CUTOFF):
+        """
+        Batch match: cache misses are scored against the catalog in one
+        cdist pass. Returns [(nutrition or None, score)] in input order,
+        the same whether or not the query was cached (0 for no match).
+        """
+        compiled, found = self._find_many(food_names, score_cutoff)
+
+        return [
+            (compiled.row(i) if i is not None else None, score)
+            for i, score in found
+        ]
+
+    def _find_many(self, food_names, score_cutoff):
+        # → (catalog, [(matched row index or None, score)] in input order)
+        compiled, cache = self._load()
+
+        queries = [normalize_query(name) for name in food_names]
+        found = {}
+        pending = []
+
+        for query in dict.fromkeys(queries):
+            cached = cache.get((query, score_cutoff))
+            if cached is MatchCache.MISSING:
+                pending.append(query)
+            else:
+                found[query] = cached
+
+        if pending:
+            with metrics.track("match_many"):
+                scores = process.cdist(
+                    pending,
+                    compiled.names,
+                    scorer=fuzz.token_sort_ratio,
+                    score_cutoff=score_cutoff,
+                    # float64 like extractOne, so match() and match_many() agree
+                    dtype=np.float64,
+                    workers=-1
+                )
+
+            # argmax keeps the first best choice, same tie-break as extractOne
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(pending)), best]
+
+            for query, i, score in zip(pending, best.tolist(), best_scores.tolist()):
+                if score < score_cutoff or score == 0:
+                    i, score = None, 0.0
+                cache.put((query, score_cutoff), (i, score))
+                found[query] = (i, score)
+
+        return compiled, [found[query] for query in queries]
+
+    def search(self, predicates, sort=None, descending=True, limit=50):
+        """
+        Range query over nutrient columns (see food_query.NutrientIndex)
+        → [nutrition dict] in result order
+        """
+        compiled = self.compiled
+        rows = compiled.nutrient_index.search(predicates, sort, descending, limit)
+        return [compiled.row(i) for i in rows]
+
+    def similar(self, food_name, k=10, score_cutoff=FOOD_MATCH_SCORE_CUTOFF):
+        """
+        Foods with the most similar nutrient profile to food_name
+        (matched like match()) → (matched nutrition dict or None,
+        [(nutrition dict, cosine score)] best first)
+        """
+        return self.similar_many([food_name], k, score_cutoff)[0]
+
+    def similar_many(self, food_names, k=10, score_cutoff=FOOD_MATCH_SCORE_CUTOFF):
+        """
+        Batch similar(): names matched in one match_many pass, neighbors
+        looked up / scanned together. Raises NeighborsNotReady while the
+        neighbor index is still being built.
+        """
+        if not self.compiled.neighbors_ready:
+            raise NeighborsNotReady()
+
+        compiled, found = self._find_many(food_names, score_cutoff)
+        rows = [i for i, _ in found if i is not None]
+        neighbors = iter(compiled.similarity.similar_many(rows, k))
+
+        results = []
+        for i, _ in found:
+            if i is None:
+                results.append((None, []))
+                continue
+            results.append((
+                compiled.row(i),
+                [(compiled.row(j), round(score, 4)) for j, score in next(neighbors)]
+            ))
+        return results
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Process-wide FoodCatalog (the data itself loads on first lookup)
+    """
+    global _catalog
+
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = FoodCatalog()
+
+    return _catalog
+
+
+if __name__ == "__main__":
+    # build step: python food_catalog.py (artifact + neighbor index)
+    print(build_neighbors(build_artifact()))
@@ -0,0 +1,256 @@
+"""
+Food log export (CSV / NDJSON, streamed) and bulk import.
+
+Export rows come straight off an unbuffered cursor, one line at a time.
+Import reads the upload line by line and works in chunks of
+IMPORT_CHUNK_ROWS: names resolved in one FoodCatalog.match_many pass,
+rows inserted with one multi-row INSERT, rollups updated, committed.
+"""
+import csv
+import io
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+import analytics
+from database import NUTRIENT_COLUMNS
+from food_catalog import get_catalog
+from rollups import add_to_rollups
+
+EXPORT_COLUMNS = ["log_date", "created_at", "food_name"] + NUTRIENT_COLUMNS
+
+IMPORT_CHUNK_ROWS = 500
+IMPORT_MAX_ROWS = 100_000
+IMPORT_MAX_ERRORS = 20
+
+# food_logs nutrient columns are DECIMAL(10,3)
+MAX_NUTRIENT_VALUE = 10 ** 7
+
+_INSERT_SQL = """
+    INSERT INTO food_logs (user_id, food_name, {columns}, log_date)
+    VALUES (%s,%s,{placeholders},%s)
+""".format(
+    columns=", ".join(NUTRIENT_COLUMNS),
+    placeholders=",".join(["%s"] * len(NUTRIENT_COLUMNS))
+)
+
+
+class InvalidImport(Exception):
+    pass
+
+
+# EXPORT
+def export_query(user_id, date_from=None, date_to=None):
+    where = ["user_id=%s"]
+    params = [user_id]
+
+    if date_from:
+        where.append("log_date >= %s")
+        params.append(date_from)
+    if date_to:
+        where.append("log_date <= %s")
+        params.append(date_to)
+
+    return f"""
+        SELECT {", ".join(EXPORT_COLUMNS)} FROM food_logs
+        WHERE {" AND ".join(where)}
+        ORDER BY log_date, created_at, id
+    """, tuple(params)
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def export_lines(rows, fmt):
+    """
+    rows (dicts, e.g. an unbuffered cursor) → CSV / NDJSON text chunks
+    """
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps({k: _plain(row[k]) for k in EXPORT_COLUMNS}) + "\n"
+        return
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_plain(row[k]) for k in EXPORT_COLUMNS])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+    # header only, for an empty export
+    if buf.tell():
+        yield buf.getvalue()
+
+
+# IMPORT
+def read_records(stream, fmt):
+    """
+    Binary upload stream → dicts, parsed line by line.
+    CSV needs a header row; food_name is the only required field.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        for record in csv.DictReader(text):
+            yield {(k or "").strip().lower(): v for k, v in record.items()}
+        return
+
+    for line_no, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise InvalidImport(f"line {line_no}: invalid JSON")
+        if not isinstance(record, dict):
+            raise InvalidImport(f"line {line_no}: expected an object")
+        yield {str(k).strip().lower(): v for k, v in record.items()}
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except TypeError:
+        # lists / objects from NDJSON
+        raise ValueError(f"not a number: {value!r}")
+
+    # "nan", "inf", "1e999" parse fine but don't fit the DECIMAL columns
+    if not math.isfinite(number) or abs(number) >= MAX_NUTRIENT_VALUE:
+        raise ValueError(f"out of range: {value!r}")
+    return number
+
+
+def _prepare(record, today):
+    """
+    record → (food_name, log_date, {column: value} or None when the
+    nutrients have to come from the catalog)
+    """
+    food_name = str(record.get("food_name") or record.get("food") or "").strip()
+    if not food_name:
+        raise ValueError("missing food_name")
+
+    log_date = record.get("log_date")
+    log_date = date.fromisoformat(str(log_date)[:10]) if log_date else today
+
+    values = None
+    if _number(record.get("caloric_value")) is not None:
+        # full row (e.g. our own export): keep its numbers
+        values = {col: _number(record.get(col)) or 0 for col in NUTRIENT_COLUMNS}
+
+    return food_name, log_date, values
+
+
+def _insert_chunk(db, user_id, chunk):
+    """
+    chunk: [(line, food_name, log_date, values or None)] → (inserted, errors)
+    """
+    errors = []
+    pending = [item for item in chunk if item[3] is None]
+
+    # one catalog pass for every name in the chunk
+    matched = get_catalog().match_many([item[1] for item in pending])
+    resolved = {}
+    for (line, food_name, log_date, _), (nutrition, _) in zip(pending, matched):
+        if nutrition is None:
+            errors.append(f"line {line}: no catalog match for {food_name!r}")
+            continue
+        resolved[line] = (
+            nutrition["food"],
+            {col: nutrition.get(col.replace("_", " ")) for col in NUTRIENT_COLUMNS}
+        )
+
+    rows = []
+    logs = []
+    for line, food_name, log_date, values in chunk:
+        if values is None:
+            if line not in resolved:
+                continue
+            food_name, values = resolved[line]
+        rows.append((user_id, food_name, *(values[col] for col in NUTRIENT_COLUMNS), log_date))
+        logs.append((log_date, values))
+
+    if not rows:
+        return 0, errors
+
+    cursor = db.cursor()
+    try:
+        # mysql-connector sends an INSERT ... VALUES executemany as one
+        # multi-row statement
+        cursor.executemany(_INSERT_SQL, rows)
+        add_to_rollups(cursor, user_id, logs)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    analytics.invalidate(user_id, [log_date for log_date, _ in logs])
+    return len(rows), errors
+
+
+def import_logs(db, user_id, records, first_line=1):
+    """
+    records (see read_records) → {"imported", "skipped", "errors"}.
+    first_line numbers the first record in error messages (2 for CSV,
+    after the header). Each chunk is its own transaction, so a bad file
+    or a database error stops the import with earlier chunks kept;
+    the result carries "error" for the former, the latter propagates.
+    """
+    today = date.today()
+    imported = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        nonlocal imported
+        added, chunk_errors = _insert_chunk(db, user_id, chunk)
+        imported += added
+        errors.extend(chunk_errors)
+        chunk.clear()
+
+    result = {}
+    n = 0
+
+    try:
+        for n, record in enumerate(records):
+            if n >= IMPORT_MAX_ROWS:
+                raise InvalidImport(f"more than {IMPORT_MAX_ROWS} rows")
+
+            line = first_line + n
+            try:
+                chunk.append((line, *_prepare(record, today)))
+            except ValueError as e:
+                errors.append(f"line {line}: {e}")
+
+            if len(chunk) >= IMPORT_CHUNK_ROWS:
+                flush()
+    except InvalidImport as e:
+        # stop at the bad record; rows before it are still imported
+        result["error"] = str(e)
+    except UnicodeDecodeError:
+        result["error"] = "file must be UTF-8"
+    except csv.Error as e:
+        result["error"] = f"line {first_line + n}: {e}"
+
+    if chunk:
+        flush()
+
+    result.update({
+        "imported": imported,
+        "skipped": len(errors),
+        "errors": errors[:IMPORT_MAX_ERRORS]
+    })
+    return result
@@ -0,0 +1,141 @@
+"""
+Range / filter queries over the catalog's nutrient matrix, e.g.
+"protein >= 20 and caloric value <= 300, top 50 by nutrition density".
+
+Every column gets a sorted index (row order + sorted values), built on
+first use. A range predicate is then two searchsorted calls, and a
+query only touches the rows of its most selective predicate, or walks
+the sort column until it has `limit` hits, whichever is cheaper. So
+latency follows the result size, not the catalog size.
+"""
+import threading
+
+import numpy as np
+
+# rows tested per step when walking the sort column
+WALK_CHUNK = 4096
+
+
+class NutrientIndex:
+
+    def __init__(self, matrix, columns):
+        self.matrix = matrix
+        self.columns = columns
+        self._column = {c: j for j, c in enumerate(columns)}
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def column(self, name):
+        """
+        "caloric_value" / "Caloric Value" → "caloric value" (None if unknown)
+        """
+        name = name.strip().lower().replace("_", " ")
+        return name if name in self._column else None
+
+    def _index(self, column):
+        # → (row ids ascending by value, sorted values)
+        index = self._sorted.get(column)
+        if index is None:
+            values = np.asarray(self.matrix[:, self._column[column]])
+            order = np.argsort(values, kind="stable").astype(np.int32)
+            index = (order, values[order])
+            with self._lock:
+                self._sorted[column] = index
+        return index
+
+    def _span(self, column, lo, hi):
+        # positions in column's sorted index with lo <= value <= hi
+        _, values = self._index(column)
+        start = 0 if lo is None else np.searchsorted(values, np.float32(lo), "left")
+        stop = len(values) if hi is None else np.searchsorted(values, np.float32(hi), "right")
+        return int(start), int(max(stop, start))
+
+    def _matches(self, rows, predicates):
+        # rows (int array) → boolean mask of rows passing every predicate
+        mask = np.ones(len(rows), dtype=bool)
+        for column, lo, hi in predicates:
+            values = self.matrix[rows, self._column[column]]
+            if lo is not None:
+                mask &= values >= np.float32(lo)
+            if hi is not None:
+                mask &= values <= np.float32(hi)
+        return mask
+
+    def search(self, predicates, sort=None, descending=True, limit=50):
+        """
+        predicates: [(column, min or None, max or None)], inclusive.
+        → row ids of the matches, ordered by `sort` (row order if None),
+        at most `limit`
+        """
+        n = len(self.matrix)
+        if limit <= 0 or n == 0:
+            return []
+
+        spans = [(self._span(c, lo, hi), c, lo, hi) for c, lo, hi in predicates]
+        if any(stop == start for (start, stop), *_ in spans):
+            return []
+
+        # estimated rows to touch: the smallest span, or walking the sort
+        # column until `limit` hits at the combined selectivity
+        driver = min(spans, key=lambda s: s[0][1] - s[0][0], default=None)
+        selectivity = 1.0
+        for (start, stop), *_ in spans:
+            selectivity *= (stop - start) / n
+        walk_cost = limit / selectivity
+
+        if sort is not None and (driver is None or walk_cost < driver[0][1] - driver[0][0]):
+            return self._walk(sort, descending, predicates, limit)
+
+        if driver is None:
+            rows = np.arange(n, dtype=np.int32)
+        else:
+            (start, stop), column, _, _ = driver
+            rows = self._index(column)[0][start:stop]
+            rest = [(c, lo, hi) for span, c, lo, hi in spans if span is not driver[0]]
+            rows = rows[self._matches(rows, rest)]
+
+        if sort is None:
+            return np.sort(rows)[:limit].tolist()
+        return self._top(rows, sort, descending, limit)
+
+    def _top(self, rows, sort, descending, limit):
+        values = self.matrix[rows, self._column[sort]]
+        if descending:
+            values = -values
+
+        if len(rows) > limit:
+            # keep the whole tie group at the cut, so ties go by row order
+            kth = np.partition(values, limit - 1)[limit - 1]
+            keep = values <= kth
+            rows, values = rows[keep], values[keep]
+
+        order = np.lexsort((rows, values))[:limit]
+        return rows[order].tolist()
+
+    def _walk(self, sort, descending, predicates, limit):
+        order, values = self._index(sort)
+        n = len(order)
+        found = []
+
+        for start in range(0, n, WALK_CHUNK):
+            if descending:
+                chunk = order[max(n - start - WALK_CHUNK, 0):n - start][::-1]
+            else:
+                chunk = order[start:start + WALK_CHUNK]
+
+            found.extend(chunk[self._matches(chunk, predicates)].tolist())
+            if len(found) >= limit:
+                break
+
+        if not descending or not found:
+            return found[:limit]
+
+        # walking backwards meets equal values in reverse row order, so the
+        # last tie group may be cut short: add all of it, then order properly
+        tie = self.matrix[found[min(limit, len(found)) - 1], self._column[sort]]
+        start, stop = self._span(sort, tie, tie)
+        ties = order[start:stop]
+        ties = ties[self._matches(ties, predicates)]
+
+        rows = np.union1d(np.array(found, dtype=np.int32), ties)
+        return self._top(rows, sort, True, limit)
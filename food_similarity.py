@@ -0,0 +1,126 @@
+"""
+"Foods similar to X" over the catalog's nutrient matrix.
+
+Each food becomes a unit vector: nutrients are log-scaled (log1p, so
+sodium in mg doesn't drown protein in g), divided by their spread
+across the catalog, then L2-normalized. Cosine similarity is then a
+dot product, and it ignores portion size: half a plate of X is still X.
+"""
+import numpy as np
+
+# rows scored per block when precomputing neighbors (block x rows floats)
+BLOCK_ROWS = 1024
+
+
+def nutrient_vectors(matrix):
+    """
+    float32 matrix (rows x nutrients) → unit vectors, same shape
+    """
+    x = np.log1p(np.maximum(np.asarray(matrix, dtype=np.float32), 0))
+
+    spread = x.std(axis=0)
+    spread[spread == 0] = 1
+    x /= spread
+
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    x /= norms
+    return np.ascontiguousarray(x, dtype=np.float32)
+
+
+def _top_k(scores, k):
+    """
+    per row of scores: k best columns, best first → (indexes, scores)
+    """
+    k = min(k, scores.shape[1])
+    # partition on the top end directly; negating would copy the block
+    idx = np.argpartition(scores, -k, axis=1)[:, -k:]
+    top = np.take_along_axis(scores, idx, axis=1)
+
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def compute_neighbors(matrix, k):
+    """
+    Precomputed neighbor index: the k most similar other rows of every
+    row → (int32 rows x k, float32 rows x k). Done once per artifact
+    (food_catalog.build_neighbors), in blocks so memory stays at
+    BLOCK_ROWS x rows.
+    """
+    vectors = nutrient_vectors(matrix)
+    n = len(vectors)
+    k = min(k, n - 1)
+
+    neighbors = np.zeros((n, max(k, 0)), dtype=np.int32)
+    scores = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbors, scores
+
+    for start in range(0, n, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, n)
+        block = vectors[start:stop] @ vectors.T
+        # never your own neighbor
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        idx, top = _top_k(block, k)
+        neighbors[start:stop] = idx
+        scores[start:stop] = top
+
+    return neighbors, scores
+
+
+class SimilarityIndex:
+    """
+    Top-k most similar rows. Rows with a precomputed neighbor list are
+    answered from it when k fits; anything else is one vectorized
+    scan (vectors @ query).
+    """
+
+    def __init__(self, matrix, neighbors=None, neighbor_scores=None):
+        self.vectors = nutrient_vectors(matrix)
+        self.neighbors = neighbors
+        self.neighbor_scores = neighbor_scores
+
+    @property
+    def precomputed(self):
+        if self.neighbors is None:
+            return 0
+        return self.neighbors.shape[1]
+
+    def similar(self, row, k):
+        """
+        → [(row index, cosine score)] best first, excluding row itself
+        """
+        return self.similar_many([row], k)[0]
+
+    def similar_many(self, rows, k):
+        """
+        Batch mode: one list per input row. Rows the neighbor index
+        can't answer are scanned together in one matrix product.
+        """
+        results = [None] * len(rows)
+        if k <= 0:
+            return [[] for _ in rows]
+
+        scan = []
+        for pos, row in enumerate(rows):
+            if k <= self.precomputed:
+                results[pos] = list(zip(
+                    self.neighbors[row, :k].tolist(),
+                    self.neighbor_scores[row, :k].tolist()
+                ))
+            else:
+                scan.append(pos)
+
+        if scan:
+            query_rows = np.array([rows[pos] for pos in scan])
+            scores = self.vectors[query_rows] @ self.vectors.T
+            scores[np.arange(len(scan)), query_rows] = -np.inf
+
+            idx, top = _top_k(scores, k)
+            for pos, r_idx, r_top in zip(scan, idx.tolist(), top.tolist()):
+                # k past the catalog size would reach the query row itself
+                results[pos] = [(j, s) for j, s in zip(r_idx, r_top) if s != -np.inf]
+
+        return results
@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# food_logs.image_path is relative to static/
+UPLOAD_DIR = os.path.join("static", "uploads")
+
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+MAX_IMAGE_SIDE = 1024
+JPEG_QUALITY = 85
+
+IMAGE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def image_path(image_id):
+    """
+    image id → path stored in food_logs.image_path (None if unknown)
+    """
+    if not image_id or not IMAGE_ID_RE.match(image_id):
+        return None
+
+    path = f"uploads/{image_id}.jpg"
+    if not os.path.exists(os.path.join("static", path)):
+        return None
+    return path
+
+
+def read_image(image_id):
+    path = image_path(image_id)
+    if path is None:
+        raise InvalidImage("Unknown image id")
+
+    with open(os.path.join("static", path), "rb") as f:
+        return f.read()
+
+
+def read_image_base64(image_id):
+    return base64.b64encode(read_image(image_id)).decode("ascii")
+
+
+def save_image(stream):
+    """
+    Store an uploaded image once, under the sha256 of the uploaded bytes.
+    The stream is spooled in chunks; new images are downscaled to
+    MAX_IMAGE_SIDE and re-encoded as JPEG. Returns the image id.
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        for chunk in iter(lambda: stream.read(64 * 1024), b""):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise InvalidImage("Image too large")
+            digest.update(chunk)
+            spool.write(chunk)
+
+        if size == 0:
+            raise InvalidImage("Empty upload")
+
+        image_id = digest.hexdigest()
+
+        # same bytes uploaded before: nothing to decode or write
+        if image_path(image_id):
+            return image_id
+
+        spool.seek(0)
+        try:
+            img = Image.open(spool)
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise InvalidImage("Not a valid image")
+
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".jpg", dir=UPLOAD_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            os.replace(tmp, os.path.join(UPLOAD_DIR, f"{image_id}.jpg"))
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    return image_id
+
+
+def save_data_url(data_url):
+    """
+    Legacy "data:image/...;base64,..." payloads
+    """
+    try:
+        raw = base64.b64decode(data_url.split(",", 1)[1])
+    except (IndexError, ValueError):
+        raise InvalidImage("Invalid image format")
+
+    return save_image(BytesIO(raw))
@@ -1,5 +1,8 @@
-from nutrition_csv import match_food
+from food_catalog import get_catalog
 from openai_meal_ai import recommend_meals
+from config import MEAL_PLAN_MODE, UPSTREAM
+from meal_planner import get_planner
+import upstream
 
 # BMR & TDEE
 def calculate_bmr(gender, weight, height, age):
@@ -59,6 +62,52 @@ def generate_desc(meal_type, items):
 
     return f"{focus} for your {meal_type.lower()}."
 
+def portion_label(name, portion):
+    if portion == 1:
+        return name
+    return f"{name} ({portion:g} servings)"
+
+
+def pick_foods_llm(form):
+    """
+    LLM suggestions matched to the catalog → {meal_type: [(data, portion)]}
+    """
+    # identical profiles in flight share one completion
+    meals_ai = upstream.call(
+        upstream.request_key("meal_plan", form),
+        UPSTREAM["meal_plan_timeout"],
+        recommend_meals,
+        form
+    )
+
+    # match every recommended food in one batch pass
+    all_foods = list(dict.fromkeys(
+        food for foods in meals_ai.values() for food in foods
+    ))
+    matched = {
+        food: data
+        for food, (data, _) in zip(all_foods, get_catalog().match_many(all_foods))
+    }
+
+    return {
+        meal_type: [(matched[food], 1.0) for food in foods if matched[food]]
+        for meal_type, foods in meals_ai.items()
+    }
+
+
+def pick_foods_local(form, tdee):
+    """
+    Local planner over the nutrient matrix → {meal_type: [(data, portion)]}
+    """
+    catalog = get_catalog()
+    plan = get_planner(catalog).plan(tdee, form.get("preferences"))
+
+    return {
+        meal_type: [(catalog.by_id(i), portion) for i, portion in picks]
+        for meal_type, picks in plan.items()
+    }
+
+
 # GENERATE MEAL PLAN
 def generate_meal_plan(form):
     bmr = calculate_bmr(
@@ -70,40 +119,43 @@ def generate_meal_plan(form):
 
     tdee = int(bmr * activity_multiplier(form["activity"]))
 
-    meals_ai = recommend_meals(form)
+    mode = form.get("mode") or MEAL_PLAN_MODE
+    if mode == "local":
+        picked = pick_foods_local(form, tdee)
+    else:
+        picked = pick_foods_llm(form)
 
     summary = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
     meals = []
 
-    for meal_type, foods in meals_ai.items():
+    for meal_type, foods in picked.items():
         meal_cal = 0
+        names = []
         items = []
 
-        for food in foods:
-            data = match_food(food)
-            if not data:
-                continue
-
-            items.append(data["food"])
+        for data, portion in foods:
+            names.append(data["food"])
+            items.append(portion_label(data["food"], portion))
 
-            meal_cal += data.get("caloric value", 0)
-            summary["calories"] += data.get("caloric value", 0)
-            summary["protein"] += data.get("protein", 0)
-            summary["carbs"] += data.get("carbohydrates", 0)
-            summary["fat"] += data.get("fat", 0)
+            meal_cal += data.get("caloric value", 0) * portion
+            summary["calories"] += data.get("caloric value", 0) * portion
+            summary["protein"] += data.get("protein", 0) * portion
+            summary["carbs"] += data.get("carbohydrates", 0) * portion
+            summary["fat"] += data.get("fat", 0) * portion
 
         meal_type_cap = meal_type.capitalize()
 
         meals.append({
             "type": meal_type_cap,
-            "title": generate_title(items),
-            "desc": generate_desc(meal_type_cap, items),
+            "title": generate_title(names),
+            "desc": generate_desc(meal_type_cap, names),
             "calories": round(meal_cal),
             "items": items
         })
 
     return {
         "target_calories": tdee,
+        "mode": mode,
         "summary": {k: round(v) for k, v in summary.items()},
         "meals": meals
     }
@@ -0,0 +1,289 @@
+"""
+Local meal planner: picks foods and portions straight from the catalog's
+nutrient matrix to hit the TDEE and macro targets, no LLM call.
+"""
+import threading
+
+import numpy as np
+
+# share of the day's calories and number of foods per meal
+MEAL_SLOTS = {
+    "breakfast": (0.25, 2),
+    "lunch": (0.35, 3),
+    "dinner": (0.30, 3),
+    "snack": (0.10, 1)
+}
+
+PORTIONS = np.array([0.5, 1.0, 1.5, 2.0])
+
+# calorie share of protein / carbs / fat
+MACRO_SPLIT = {"protein": 0.20, "carbs": 0.50, "fat": 0.30}
+LOW_CARB_SPLIT = {"protein": 0.30, "carbs": 0.20, "fat": 0.50}
+KCAL_PER_GRAM = {"protein": 4, "carbs": 4, "fat": 9}
+
+# calories matter most, then protein
+LOSS_WEIGHTS = np.array([4.0, 2.0, 1.0, 1.0])
+
+# greedy pick is random among this many best candidates, for variety
+TOP_K = 5
+
+# single foods outside this range make poor meal items (spices, oils, ...)
+MIN_ITEM_KCAL = 40
+MAX_ITEM_KCAL = 900
+
+# ingredients, drinks and condiments rather than meal items
+NOT_A_MEAL = {
+    "flour", "powder", "extract", "yeast", "oil", "salt",
+    "spice", "seasoning", "syrup", "lard", "margarine", "shortening",
+    "gelatin", "juice", "nectar", "drink", "soda", "water", "coffee", "tea",
+    "beer", "wine", "liquor", "vodka", "whiskey", "rum", "gin", "beverage",
+    "sauce", "dressing", "vinegar", "sugar", "sweetener", "supplement"
+}
+
+# restaurant names in catalog entries ("french fries burger king"): not
+# what the food is made of
+BRANDS = (
+    "burger king", "kentucky fried chicken", "taco bell", "pizza hut",
+    "carls jr", "mcdonalds", "dominos"
+)
+
+# words matched inside compound tokens ("cheeseburger", "catfish") never
+# match these
+NOT_COMPOUND = {"limburger", "meatless", "buckwheat", "breadfruit", "breadnut"}
+
+MEAT_WORDS = {
+    "beef", "pork", "turkey", "veal", "lamb", "mutton", "ham",
+    "bacon", "sausage", "salami", "pepperoni", "prosciutto", "chorizo",
+    "steak", "liver", "duck", "goose", "whopper", "hamburger", "cheeseburger",
+    "venison", "bison", "rabbit", "jerky", "frankfurter", "ostrich",
+    "bologna", "carne", "pollo", "salmon", "tuna", "trout", "cod", "shrimp", "prawn", "crab",
+    "lobster", "clam", "clams", "oyster", "oysters", "mussel", "mussels",
+    "scallop", "scallops", "squid", "octopus", "anchovy", "anchovies",
+    "sardine", "sardines", "herring", "mackerel", "tilapia", "halibut",
+    "caviar", "roe", "gelatin", "lard", "broth",
+    "abalone", "bass", "burbot", "carp", "cisco", "conch", "croaker", "cusk",
+    "eel", "flounder", "grouper", "haddock", "ling", "lingcod",
+    "mullet", "perch", "pike", "pollock", "pompano", "pout", "scup", "shad",
+    "shark", "sheepshead", "snapper", "sturgeon", "turbot",
+    "walleye", "whelk", "whiting", "yellowtail", "seatrout",
+    "caribou", "emu", "pheasant", "tripe", "spleen",
+    "mortadella", "scrapple", "cerdo", "mcmuffin", "pepperpot"
+}
+MEAT_STEMS = ("chicken", "meat", "fish", "wurst")
+
+# dishes whose single words also name other foods ("chili pepper",
+# "bread loaf", "mac iver"), matched as whole phrases
+MEAT_PHRASES = (
+    "chili con carne", "chili with beans", "chili without beans",
+    "big mac", "big n tasty", "quarter pounder", "cold cuts",
+    "meat loaf", "barbecue loaf", "honey loaf", "olive loaf", "peppered loaf",
+    "picnic loaf", "pimiento loaf", "chuck blade", "chuck roast"
+)
+
+# fish named by an everyday word: meat only as "<fish> <preparation>"
+# ("spot cooked", not "hot spot chips")
+FISH_WORDS = {"drum", "spot", "sucker"}
+PREPARATION = {"raw", "cooked", "fried", "baked", "smoked", "dried", "canned"}
+
+# dishes that contain meat unless the name says otherwise
+# ("lasagna" / "cheese lasagna", "burger" / "veggie burger")
+USUALLY_MEAT = ("burger", "lasagna", "wonton", "dumpling", "ravioli", "tortellini",
+                "taco", "burrito", "empanada", "hotdog")
+VEGETARIAN_MARKERS = {
+    "cheese", "vegetable", "vegetables", "veggie", "vegetarian", "vegan",
+    "bean", "beans", "tofu", "spinach", "mushroom", "fruit", "shell", "shells",
+    "roll"
+}
+
+NOT_HALAL = {
+    "pork", "ham", "bacon", "lard", "salami", "pepperoni", "prosciutto",
+    "chorizo", "gelatin", "wine", "beer", "liquor", "vodka", "whiskey",
+    "rum", "gin", "sake", "brandy", "tequila", "daiquiri", "colada",
+    "mortadella", "scrapple", "cerdo"
+}
+NOT_HALAL_STEMS = ("pork", "wurst", "bier")
+
+GLUTEN_WORDS = {
+    "pasta", "macaroni", "spaghetti", "barley", "rye", "flour", "biscuit",
+    "pie", "donut", "bagel", "muffin", "pizza", "roll", "bran", "couscous",
+    "semolina", "sandwich", "croissant", "cereal", "malt", "beer", "matzo",
+    "pretzel", "pretzels", "seitan", "bulgur", "farina", "triticale",
+    "toast", "toaster", "toastbrot", "breaded", "battered", "focaccia",
+    "tortilla", "empanada", "burrito", "strudel", "gnocchi", "pita", "naan",
+    "bun", "brownie", "biscotti", "scone", "crepe", "churro", "orzo", "udon",
+    "ramen", "mein", "crumbs", "panko", "tempura", "graham", "teriyaki",
+    "whopper", "nugget", "nuggets", "mcnuggets", "stuffing", "dog", "gyro",
+    "chimichanga"
+}
+GLUTEN_PHRASES = (
+    "big mac", "big n tasty", "quarter pounder", "chicken strips",
+    "chicken tenders", "crispy chicken", "chicken crispy", "onion rings"
+)
+GLUTEN_STEMS = (
+    "wheat", "bread", "noodle", "cracker", "cake", "cookie", "pastry",
+    "waffle", "burger", "crouton", "dumpling", "wonton", "lasagna",
+    "ravioli", "tortellini", "bier"
+)
+
+
+def _tokens(name):
+    for brand in BRANDS:
+        name = name.replace(brand, " ")
+    return name.split()
+
+
+def _excluded(tokens, words, stems=()):
+    return any(
+        t in words
+        or (t.endswith("s") and t[:-1] in words)
+        or (t not in NOT_COMPOUND and any(stem in t for stem in stems))
+        for t in tokens
+    )
+
+
+def _has_phrase(tokens, phrases):
+    name = f" {' '.join(tokens)} "
+    return any(f" {phrase} " in name for phrase in phrases)
+
+
+def _is_meat(tokens):
+    if "meatless" in tokens:
+        return False
+    if _excluded(tokens, MEAT_WORDS, MEAT_STEMS) or _has_phrase(tokens, MEAT_PHRASES):
+        return True
+    if tokens and tokens[0] in FISH_WORDS and PREPARATION.issuperset(tokens[1:]):
+        return True
+    return _excluded(tokens, (), USUALLY_MEAT) and not VEGETARIAN_MARKERS.intersection(tokens)
+
+
+def _has_gluten(tokens):
+    return _excluded(tokens, GLUTEN_WORDS, GLUTEN_STEMS) or _has_phrase(tokens, GLUTEN_PHRASES)
+
+
+def _prefs(preferences):
+    return frozenset(p.strip().lower() for p in preferences or [])
+
+
+class MealPlanner:
+    """
+    Greedy per-slot selection over the catalog, vectorized with NumPy:
+    every (food, portion) candidate is scored at once against what the
+    meal still needs.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.compiled = compiled = catalog.compiled
+        cols = compiled.columns
+
+        # calories, protein, carbs, fat per catalog row
+        self.macros = np.asarray(compiled.matrix, dtype=np.float64)[:, [
+            cols.index("caloric value"),
+            cols.index("protein"),
+            cols.index("carbohydrates"),
+            cols.index("fat")
+        ]]
+        self.tokens = [_tokens(name) for name in compiled.names]
+
+        kcal = self.macros[:, 0]
+        self.base = np.array([
+            MIN_ITEM_KCAL <= kcal[i] <= MAX_ITEM_KCAL
+            and not _excluded(tokens, NOT_A_MEAL)
+            # raw vegetables are fine, raw meat and fish are not
+            and not ("raw" in tokens and _is_meat(tokens))
+            for i, tokens in enumerate(self.tokens)
+        ], dtype=bool)
+
+        self._eligible = {}
+        self._lock = threading.Lock()
+
+    def eligible(self, prefs):
+        """
+        Row indexes allowed under the given preferences (cached per set)
+        """
+        with self._lock:
+            rows = self._eligible.get(prefs)
+        if rows is not None:
+            return rows
+
+        mask = self.base.copy()
+        for i, tokens in enumerate(self.tokens):
+            if not mask[i]:
+                continue
+            if "vegetarian" in prefs and _is_meat(tokens):
+                mask[i] = False
+            elif "halal" in prefs and _excluded(tokens, NOT_HALAL, NOT_HALAL_STEMS):
+                mask[i] = False
+            elif "gluten free" in prefs and _has_gluten(tokens):
+                mask[i] = False
+
+        rows = np.flatnonzero(mask)
+        with self._lock:
+            self._eligible[prefs] = rows
+        return rows
+
+    def targets(self, tdee, prefs):
+        split = LOW_CARB_SPLIT if "low carb" in prefs else MACRO_SPLIT
+        return np.array([
+            tdee,
+            tdee * split["protein"] / KCAL_PER_GRAM["protein"],
+            tdee * split["carbs"] / KCAL_PER_GRAM["carbs"],
+            tdee * split["fat"] / KCAL_PER_GRAM["fat"]
+        ])
+
+    def plan(self, tdee, preferences=None, seed=None):
+        """
+        → {meal_type: [(catalog row index, portion)]}
+        """
+        prefs = _prefs(preferences)
+        rows = self.eligible(prefs)
+        day_target = self.targets(tdee, prefs)
+        rng = np.random.default_rng(seed)
+
+        # (food, portion, macro) for every eligible food
+        candidates = self.macros[rows][:, None, :] * PORTIONS[None, :, None]
+        used = np.zeros(len(rows), dtype=bool)
+
+        plan = {}
+        for meal_type, (share, n_items) in MEAL_SLOTS.items():
+            target = day_target * share
+            scale = np.maximum(target, 1.0)
+            total = np.zeros(4)
+            picked = []
+
+            for slot in range(n_items):
+                # after slot k of n the meal should be at k/n of its target
+                goal = target * (slot + 1) / n_items
+                err = (total + candidates - goal) / scale
+                loss = (err ** 2 * LOSS_WEIGHTS).sum(axis=2)
+                loss[used] = np.inf
+
+                flat = loss.ravel()
+                k = min(TOP_K, int(np.isfinite(flat).sum()))
+                if k == 0:
+                    break
+                best = np.argpartition(flat, k - 1)[:k]
+                choice = best[rng.integers(k)]
+
+                food, portion = divmod(int(choice), len(PORTIONS))
+                used[food] = True
+                total += candidates[food, portion]
+                picked.append((int(rows[food]), float(PORTIONS[portion])))
+
+            plan[meal_type] = picked
+
+        return plan
+
+
+_planner = None
+_planner_lock = threading.Lock()
+
+
+def get_planner(catalog):
+    global _planner
+
+    with _planner_lock:
+        # rebuilt when the catalog is reloaded
+        if _planner is None or _planner.compiled is not catalog.compiled:
+            _planner = MealPlanner(catalog)
+        return _planner
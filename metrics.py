@@ -0,0 +1,253 @@
+"""
+In-process request metrics, exposed Prometheus-style on /metrics:
+per-route latency and SQL query counts, time spent in upstream (OpenAI)
+calls and catalog matching, plus pool / cache gauges.
+
+Counters live per worker process; scrape every worker (or run one).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+from config import METRICS
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    "nutrimind_requests_total": "HTTP requests by route, method and status",
+    "nutrimind_request_seconds": "HTTP request latency (until the response is returned, not streamed)",
+    "nutrimind_request_queries": "SQL statements executed per request",
+    "nutrimind_db_query_seconds": "SQL statement latency",
+    "nutrimind_call_seconds": "Time a request spent in upstream calls / catalog matching",
+    "nutrimind_upstream_seconds": "OpenAI call duration on the upstream pool",
+    "nutrimind_upstream_errors_total": "Upstream calls that timed out or failed"
+}
+
+_lock = threading.Lock()
+
+# name -> {labels tuple: [bucket counts..., sum, count]}
+_histograms = {}
+# name -> {labels tuple: value}
+_counters = {}
+# prefix -> callable returning {name: number}
+_gauges = {}
+
+_buckets = {
+    "nutrimind_request_queries": QUERY_BUCKETS
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    buckets = _buckets.get(name, LATENCY_BUCKETS)
+    key = _key(labels)
+
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            # one slot per bucket + +Inf, then sum and count
+            h = series[key] = [0] * (len(buckets) + 3)
+        h[bisect.bisect_left(buckets, value)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+def inc(name, n=1, **labels):
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + n
+
+
+def register_gauges(prefix, fn):
+    """
+    fn() → {name: number}, read on every scrape as <prefix>_<name>
+    """
+    _gauges[prefix] = fn
+
+
+def current_route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "none"
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    return g.get("metrics")
+
+
+@contextmanager
+def track(call):
+    """
+    Time a block as `call` (vision, meal_plan, match, ...) for the
+    current route, and add it to the request's slow-log breakdown
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("nutrimind_call_seconds", elapsed, call=call, route=current_route())
+
+        stats = _request_stats()
+        if stats is not None:
+            stats["calls"][call] = stats["calls"].get(call, 0) + elapsed
+
+
+# DB CURSOR WRAPPER
+class CountingCursor:
+    """
+    Cursor proxy: counts and times execute / executemany
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            observe("nutrimind_db_query_seconds", elapsed, route=current_route())
+
+            stats = _request_stats()
+            if stats is not None:
+                stats["queries"] += 1
+                stats["db_seconds"] += elapsed
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    """
+    Connection proxy whose cursors are CountingCursors
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# REQUEST HOOKS
+def _before_request():
+    g.metrics = {
+        "start": time.perf_counter(),
+        "queries": 0,
+        "db_seconds": 0.0,
+        "calls": {}
+    }
+
+
+def _after_request(response):
+    stats = g.pop("metrics", None)
+    if stats is None:
+        return response
+
+    elapsed = time.perf_counter() - stats["start"]
+    route = current_route()
+
+    inc("nutrimind_requests_total", route=route, method=request.method,
+        status=str(response.status_code))
+    observe("nutrimind_request_seconds", elapsed, route=route, method=request.method)
+    observe("nutrimind_request_queries", stats["queries"], route=route)
+
+    if elapsed >= METRICS["slow_request_seconds"]:
+        calls = " ".join(f"{k}={v * 1000:.0f}ms" for k, v in stats["calls"].items())
+        print(
+            "SLOW REQUEST:", request.method, request.path,
+            f"{elapsed * 1000:.0f}ms",
+            f"queries={stats['queries']}",
+            f"db={stats['db_seconds'] * 1000:.0f}ms",
+            calls
+        )
+
+    return response
+
+
+# EXPOSITION
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    lines = []
+
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {
+            name: {key: list(h) for key, h in series.items()}
+            for name, series in _histograms.items()
+        }
+
+    for name, series in sorted(counters.items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{_labels(key)} {value}")
+
+    for name, series in sorted(histograms.items()):
+        buckets = _buckets.get(name, LATENCY_BUCKETS)
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, h in sorted(series.items()):
+            cumulative = 0
+            for le, n in zip(list(buckets) + ["+Inf"], h):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key)} {h[-2]:.6f}")
+            lines.append(f"{name}_count{_labels(key)} {h[-1]}")
+
+    for prefix, fn in sorted(_gauges.items()):
+        try:
+            values = fn()
+        except Exception as e:
+            print("METRICS GAUGE ERROR:", prefix, e)
+            continue
+        for name, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
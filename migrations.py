@@ -0,0 +1,224 @@
+"""
+Versioned schema migrations (flask migrate) and an EXPLAIN check for
+the hot queries (flask check-queries).
+
+Migrations run in order and are recorded in schema_migrations. MySQL
+commits DDL implicitly, so every step is written to be re-runnable:
+a migration that failed half way can simply be run again.
+"""
+import re
+
+from database import NUTRIENT_COLUMNS
+from rollups import ROLLUP_TABLE_DDL
+
+NUTRIENT_DDL = ",\n      ".join(f"{col} DECIMAL(10,3) NULL" for col in NUTRIENT_COLUMNS)
+
+
+def add_index(table, name, columns, unique=False):
+    """
+    Step: create an index unless the table already has one on exactly
+    these columns (e.g. created by hand before migrations existed)
+    """
+    def step(cursor):
+        cursor.execute("""
+            SELECT index_name, MIN(non_unique),
+                   GROUP_CONCAT(column_name ORDER BY seq_in_index)
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s
+            GROUP BY index_name
+        """, (table,))
+        for index_name, non_unique, index_columns in cursor.fetchall():
+            if index_name == name:
+                return
+            if index_columns.split(",") == columns and (not unique or not non_unique):
+                return
+
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+
+    return step
+
+
+# (version, description, steps): a step is SQL or a callable(cursor)
+MIGRATIONS = [
+    (1, "core tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          full_name VARCHAR(100) NOT NULL,
+          email VARCHAR(255) NOT NULL,
+          password_hash VARCHAR(255) NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS food_logs (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          food_name VARCHAR(255) NOT NULL,
+          image_path VARCHAR(255) NULL,
+          {NUTRIENT_DDL},
+          log_date DATE NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS hydration_logs (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          log_date DATE NOT NULL,
+          glasses INT NOT NULL DEFAULT 0,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS meal_plans (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          user_id INT NOT NULL,
+          plan_date DATE NOT NULL,
+          calories INT NOT NULL DEFAULT 0,
+          protein INT NOT NULL DEFAULT 0,
+          carbs INT NOT NULL DEFAULT 0,
+          fat INT NOT NULL DEFAULT 0,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS meal_plan_meals (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          plan_id INT NOT NULL,
+          meal_type VARCHAR(20) NOT NULL,
+          title VARCHAR(255) NOT NULL,
+          description TEXT,
+          calories INT NOT NULL DEFAULT 0,
+          FOREIGN KEY (plan_id) REFERENCES meal_plans(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS meal_plan_items (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          meal_id INT NOT NULL,
+          item_name VARCHAR(255) NOT NULL,
+          FOREIGN KEY (meal_id) REFERENCES meal_plan_meals(id) ON DELETE CASCADE
+        )
+        """
+    ]),
+    (2, "daily nutrient rollups", [
+        ROLLUP_TABLE_DDL
+    ]),
+    (3, "keys and indexes for the hot queries", [
+        # login
+        add_index("users", "users_email", ["email"], unique=True),
+        # food log pages / stream (keyset on created_at, id), with and
+        # without a date filter; export and rollup backfill by date
+        add_index("food_logs", "food_logs_user_created", ["user_id", "created_at", "id"]),
+        add_index("food_logs", "food_logs_user_date", ["user_id", "log_date", "created_at", "id"]),
+        # ON DUPLICATE KEY targets
+        add_index("hydration_logs", "hydration_logs_user_date", ["user_id", "log_date"], unique=True),
+        add_index("meal_plans", "meal_plans_user_date", ["user_id", "plan_date"], unique=True),
+        # children by parent, in insert order
+        add_index("meal_plan_meals", "meal_plan_meals_plan", ["plan_id", "id"]),
+        add_index("meal_plan_items", "meal_plan_items_meal", ["meal_id", "id"])
+    ])
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version INT PRIMARY KEY,
+          description VARCHAR(255) NOT NULL,
+          applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db, log=print):
+    """
+    Apply pending migrations in order → number applied
+    """
+    cursor = db.cursor()
+    done = applied_versions(cursor)
+    applied = 0
+
+    for version, description, steps in MIGRATIONS:
+        if version in done:
+            continue
+
+        log(f"applying {version}: {description}")
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s,%s)",
+            (version, description)
+        )
+        db.commit()
+        applied += 1
+
+    return applied
+
+
+# EXPLAIN CHECK
+# access types that read the whole table / index
+FULL_SCAN_TYPES = {"ALL", "index"}
+
+# below this many rows MySQL scans a table whatever its indexes, so a
+# plan on it says nothing about production
+CHECK_MIN_ROWS = 1000
+
+TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+
+def query_tables(sql):
+    """
+    Base tables a query reads (FROM / JOIN), in first-seen order
+    """
+    return list(dict.fromkeys(TABLE_RE.findall(sql)))
+
+
+def table_rows(cursor, tables):
+    """
+    → {table: exact row count}
+    """
+    rows = {}
+    for table in tables:
+        cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+        rows[table] = cursor.fetchone()[0]
+    return rows
+
+
+def analyze_tables(cursor, tables):
+    # refresh index statistics, e.g. right after seeding
+    for table in tables:
+        cursor.execute(f"ANALYZE TABLE `{table}`")
+        cursor.fetchall()
+
+
+def explain_problems(cursor, sql, params):
+    """
+    EXPLAIN one query → ["<table>: <type> scan (key=..., rows=...)"]
+    for every table it reads in full
+    """
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [d[0].lower() for d in cursor.description]
+
+    problems = []
+    for values in cursor.fetchall():
+        row = dict(zip(columns, values))
+        table = row.get("table") or ""
+        # derived tables / "no tables used" rows
+        if not table or table.startswith("<"):
+            continue
+        if row.get("type") in FULL_SCAN_TYPES:
+            problems.append(
+                f"{table}: {row['type']} scan (key={row.get('key')}, rows={row.get('rows')})"
+            )
+    return problems
@@ -1,7 +1,9 @@
 import os
 from openai import OpenAI
+from config import UPSTREAM
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# no SDK retries: the upstream pool thread is held for at most one timeout
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
 def recommend_meals(profile):
     prompt = f"""
@@ -39,7 +41,8 @@ Return JSON exactly:
     res = client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[{"role": "user", "content": prompt}],
-        temperature=0.6
+        temperature=0.6,
+        timeout=UPSTREAM["meal_plan_timeout"]
     )
 
     return eval(res.choices[0].message.content)
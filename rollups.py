@@ -0,0 +1,78 @@
+from collections import defaultdict
+from database import NUTRIENT_COLUMNS
+
+# one row per user per day, kept in step with food_logs
+ROLLUP_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_nutrient_rollups (
+      user_id INT NOT NULL,
+      log_date DATE NOT NULL,
+      log_count INT UNSIGNED NOT NULL DEFAULT 0,
+      {columns},
+      PRIMARY KEY (user_id, log_date)
+    )
+""".format(columns=",\n      ".join(
+    f"{col} DECIMAL(14,3) NOT NULL DEFAULT 0" for col in NUTRIENT_COLUMNS
+))
+
+_UPSERT_SQL = """
+    INSERT INTO daily_nutrient_rollups
+      (user_id, log_date, log_count, {columns})
+    VALUES (%s,%s,%s,{placeholders})
+    ON DUPLICATE KEY UPDATE
+      log_count=log_count+VALUES(log_count),
+      {updates}
+""".format(
+    columns=", ".join(NUTRIENT_COLUMNS),
+    placeholders=",".join(["%s"] * len(NUTRIENT_COLUMNS)),
+    updates=",\n      ".join(f"{c}={c}+VALUES({c})" for c in NUTRIENT_COLUMNS)
+)
+
+
+def add_to_rollups(cursor, user_id, logs):
+    """
+    logs: [(log_date, {nutrient column: value})] just inserted into
+    food_logs. Run on the same cursor, before the commit, so the
+    rollup and the raw logs change in one transaction.
+    """
+    days = defaultdict(lambda: [0, defaultdict(float)])
+
+    for log_date, values in logs:
+        day = days[log_date]
+        day[0] += 1
+        for col in NUTRIENT_COLUMNS:
+            day[1][col] += float(values.get(col) or 0)
+
+    cursor.executemany(_UPSERT_SQL, [
+        (user_id, log_date, count, *(sums[col] for col in NUTRIENT_COLUMNS))
+        for log_date, (count, sums) in days.items()
+    ])
+
+
+def backfill_rollups(db, user_id=None):
+    """
+    Rebuild rollup rows from food_logs (all users, or one)
+    """
+    cursor = db.cursor()
+    cursor.execute(ROLLUP_TABLE_DDL)
+
+    where = "WHERE user_id=%s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    try:
+        cursor.execute(f"DELETE FROM daily_nutrient_rollups {where}", params)
+        cursor.execute(f"""
+            INSERT INTO daily_nutrient_rollups
+              (user_id, log_date, log_count, {", ".join(NUTRIENT_COLUMNS)})
+            SELECT user_id, log_date, COUNT(*),
+              {", ".join(f"COALESCE(SUM({c}),0)" for c in NUTRIENT_COLUMNS)}
+            FROM food_logs
+            {where}
+            GROUP BY user_id, log_date
+        """, params)
+        rows = cursor.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return rows
@@ -0,0 +1,279 @@
+"""
+Server-side Flask sessions: the cookie only carries a random session
+id, the data (user, generated meal plan, ...) lives in a store.
+
+Stores are pluggable (SESSION_STORE["backend"]); the default is a
+SQLite file shared by all workers, with TTL eviction.
+"""
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from config import SESSION_STORE
+
+SID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+
+class SessionStore(ABC):
+    """
+    Backend interface: serialized session data by session id
+    """
+
+    @abstractmethod
+    def load(self, sid):
+        """→ (data str, expires_at) or None if missing / expired"""
+
+    @abstractmethod
+    def save(self, sid, data, expires_at):
+        pass
+
+    @abstractmethod
+    def touch(self, sid, expires_at):
+        pass
+
+    @abstractmethod
+    def delete(self, sid):
+        pass
+
+    @abstractmethod
+    def evict_expired(self):
+        """→ number of sessions removed"""
+
+
+class SQLiteSessionStore(SessionStore):
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+              sid TEXT PRIMARY KEY,
+              data TEXT NOT NULL,
+              expires_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, expires_at FROM sessions WHERE sid=? AND expires_at > ?",
+                (sid, time.time())
+            ).fetchone()
+        return row
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?,?,?)",
+                (sid, data, expires_at)
+            )
+            self._db.commit()
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            self._db.execute("UPDATE sessions SET expires_at=? WHERE sid=?", (expires_at, sid))
+            self._db.commit()
+
+    def delete(self, sid):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE sid=?", (sid,))
+            self._db.commit()
+
+    def evict_expired(self):
+        with self._lock:
+            cur = self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        return cur.rowcount
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process dict: single-worker development only
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        row = self._data.get(sid)
+        if row is None or row[1] <= time.time():
+            return None
+        return row
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._data[sid] = (data, expires_at)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            if sid in self._data:
+                self._data[sid] = (self._data[sid][0], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, exp) in self._data.items() if exp <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+BACKENDS = {
+    "sqlite": lambda conf: SQLiteSessionStore(conf["path"]),
+    "memory": lambda conf: MemorySessionStore()
+}
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, data=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.modified = False
+        self.accessed = False
+        self.replaced_sid = None
+
+    # reads mark the session accessed (Vary: Cookie), as Flask's own
+    # session does; newer Flask also sets it on any use of the proxy
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.accessed = True
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """
+        Move the data to a new session id, e.g. on login, so an id
+        planted before authentication is worthless afterwards
+        """
+        if self.sid is not None:
+            self.replaced_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+
+    serializer = session_json_serializer
+
+    def __init__(self, store, ttl, evict_interval):
+        self.store = store
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self._next_eviction = 0
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or not SID_RE.match(sid):
+            return ServerSideSession()
+
+        row = self.store.load(sid)
+        if row is None:
+            return ServerSideSession()
+
+        try:
+            data = self.serializer.loads(row[0])
+        except ValueError:
+            return ServerSideSession()
+        return ServerSideSession(data, sid, row[1])
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # the response depends on who is asking: keep it out of shared caches
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+
+        if not session:
+            # cleared (logout) or never used
+            if session.modified and (session.sid or session.replaced_sid):
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add("Cookie")
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl
+        new = session.sid is None
+
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+
+        if session.modified or new:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+            self._maybe_evict(now)
+        elif session.expires_at - now < self.ttl / 2:
+            # sliding expiry, written at most twice per ttl
+            self.store.touch(session.sid, expires_at)
+        else:
+            return
+
+        # the id never changes; a browser-session cookie is only sent once
+        if not new and not session.permanent:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add("Cookie")
+
+    def _maybe_evict(self, now):
+        if now < self._next_eviction:
+            return
+        self._next_eviction = now + self.evict_interval
+        try:
+            self.store.evict_expired()
+        except Exception as e:
+            print("SESSION EVICT ERROR:", e)
+
+
+def init_sessions(app, conf=SESSION_STORE):
+    store = BACKENDS[conf["backend"]](conf)
+    app.session_interface = ServerSideSessionInterface(
+        store, conf["ttl"], conf["evict_interval"]
+    )
+    return store
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# vision.py builds an OpenAI client at import; tests never call it
+os.environ.setdefault("OPENAI_API_KEY", "test")
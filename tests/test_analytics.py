@@ -0,0 +1,150 @@
+from datetime import date, timedelta
+
+import pytest
+
+import analytics
+import food_log_io
+from database import NUTRIENT_COLUMNS
+
+
+def spans(start, end, granularity):
+    starts, ends = analytics.bucket_spans(start, end, granularity)
+    return [(str(s), str(e)) for s, e in zip(starts, ends)]
+
+
+@pytest.mark.parametrize("start, end, granularity, expected", [
+    # Monday → Sunday: one full week
+    (date(2026, 3, 2), date(2026, 3, 8), "week", [("2026-03-02", "2026-03-08")]),
+    # Sunday → Monday: two clipped weeks
+    (date(2026, 3, 8), date(2026, 3, 9), "week",
+     [("2026-03-08", "2026-03-08"), ("2026-03-09", "2026-03-09")]),
+    # week across a year end
+    (date(2025, 12, 31), date(2026, 1, 5), "week",
+     [("2025-12-31", "2026-01-04"), ("2026-01-05", "2026-01-05")]),
+    # last day of a month → first day of the next, leap February
+    (date(2024, 1, 31), date(2024, 3, 1), "month",
+     [("2024-01-31", "2024-01-31"), ("2024-02-01", "2024-02-29"), ("2024-03-01", "2024-03-01")]),
+    (date(2025, 12, 1), date(2026, 1, 31), "month",
+     [("2025-12-01", "2025-12-31"), ("2026-01-01", "2026-01-31")]),
+    (date(2026, 3, 5), date(2026, 3, 5), "day", [("2026-03-05", "2026-03-05")]),
+])
+def test_bucket_spans_edges(start, end, granularity, expected):
+    assert spans(start, end, granularity) == expected
+    assert analytics.bucket_count(start, end, granularity) == len(expected)
+
+
+@pytest.mark.parametrize("granularity", analytics.GRANULARITIES)
+def test_bucket_count_matches_spans(granularity):
+    first = date(2025, 12, 20)
+    for offset in range(14):
+        start = first + timedelta(days=offset)
+        for length in range(0, 70, 3):
+            end = start + timedelta(days=length)
+            assert analytics.bucket_count(start, end, granularity) == len(spans(start, end, granularity))
+
+
+class FakeRollups:
+    """
+    daily_nutrient_rollups in a dict, behind the cursor calls that
+    nutrient_series and the food log writers make
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def execute(self, sql, params):
+        user_id, start, end = params
+        self.queries.append((start, end))
+        self._rows = [
+            (day, *vector) for (user, day), vector in sorted(self.days.items())
+            if user == user_id and start <= day <= end
+        ]
+
+    def fetchall(self):
+        return self._rows
+
+    def executemany(self, sql, rows):
+        if "daily_nutrient_rollups" not in sql:
+            return
+        for user_id, log_date, count, *sums in rows:
+            vector = self.days.setdefault((user_id, log_date), [0] * len(analytics.VECTOR_COLUMNS))
+            vector[0] += count
+            for i, value in enumerate(sums, 1):
+                vector[i] += value
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    cache = analytics.ReportCache(str(tmp_path / "reports.sqlite3"), max_entries=1000, evict_interval=60)
+    monkeypatch.setattr(analytics, "_cache", cache)
+    return FakeRollups()
+
+
+def log(db, user_id, log_date, kcal):
+    values = dict.fromkeys(NUTRIENT_COLUMNS, 0)
+    values["caloric_value"] = kcal
+    food_log_io._insert_chunk(db, user_id, [(1, "apple", log_date, values)])
+
+
+def kcal(series):
+    return [bucket["caloric_value"] for bucket in series]
+
+
+def test_backdated_import_evicts_closed_buckets(db):
+    start, end = date(2025, 1, 1), date(2025, 3, 31)
+    log(db, 7, date(2025, 2, 10), 100)
+
+    for granularity in ("month", "week"):
+        analytics.nutrient_series(db, 7, start, end, granularity, ["caloric_value"])
+    db.queries.clear()
+    # closed buckets: served from the cache
+    assert kcal(analytics.nutrient_series(db, 7, start, end, "month", ["caloric_value"])) == [0, 100, 0]
+    assert db.queries == []
+
+    # another user's write leaves this user's cache alone
+    log(db, 8, date(2025, 2, 11), 999)
+    log(db, 7, date(2025, 2, 11), 250)
+
+    month = analytics.nutrient_series(db, 7, start, end, "month", ["caloric_value"])
+    assert kcal(month) == [0, 350, 0]
+    # only February was evicted and re-read
+    assert db.queries == [(date(2025, 2, 1), date(2025, 2, 28))]
+
+    db.queries.clear()
+    week = analytics.nutrient_series(db, 7, start, end, "week", ["caloric_value"])
+    assert sum(kcal(week)) == 350
+    assert db.queries == [(date(2025, 2, 10), date(2025, 2, 16))]
+
+
+def test_clipped_bucket_cached_apart_from_full_bucket(db):
+    monday, wednesday, sunday = date(2025, 2, 10), date(2025, 2, 12), date(2025, 2, 16)
+    log(db, 7, monday, 100)
+    log(db, 7, wednesday, 200)
+
+    clipped = analytics.nutrient_series(db, 7, wednesday, sunday, "week", ["caloric_value"])
+    assert [(b["start"], b["end"], b["days"]) for b in clipped] == [("2025-02-12", "2025-02-16", 5)]
+    assert kcal(clipped) == [200]
+
+    db.queries.clear()
+    full = analytics.nutrient_series(db, 7, monday, sunday, "week", ["caloric_value"])
+    assert kcal(full) == [300]
+    assert db.queries == [(monday, sunday)]
+
+    # both are cached now, each under its own span
+    db.queries.clear()
+    assert kcal(analytics.nutrient_series(db, 7, wednesday, sunday, "week", ["caloric_value"])) == [200]
+    assert kcal(analytics.nutrient_series(db, 7, monday, sunday, "week", ["caloric_value"])) == [300]
+    assert db.queries == []
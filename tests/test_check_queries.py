@@ -0,0 +1,64 @@
+import pytest
+
+import app as nutrimind
+
+
+class FakeCursor:
+    """
+    COUNT(*) → rows[table]; EXPLAIN → one plan row of access type `scan`
+    """
+
+    def __init__(self, rows, scan="ref"):
+        self.rows = rows
+        self.scan = scan
+        self.description = None
+        self.executed = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if sql.startswith("SELECT COUNT(*)"):
+            self._result = [(self.rows[sql.split("`")[1]],)]
+        elif sql.startswith("EXPLAIN"):
+            self.description = [("table",), ("type",), ("key",), ("rows",)]
+            self._result = [("food_logs", self.scan, None, 5000)]
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+@pytest.fixture
+def run(monkeypatch):
+    def run(cursor, *args):
+        monkeypatch.setattr(nutrimind, "get_db", lambda: type("DB", (), {"cursor": lambda self: cursor})())
+        return nutrimind.app.test_cli_runner().invoke(args=["check-queries", *args])
+    return run
+
+
+TABLES = ["users", "daily_nutrient_rollups", "hydration_logs", "meal_plans",
+          "meal_plan_meals", "food_logs", "meal_plan_items"]
+
+
+def test_small_tables_are_inconclusive(run):
+    cursor = FakeCursor(dict.fromkeys(TABLES, 50_000) | {"meal_plan_items": 12})
+    result = run(cursor)
+
+    assert result.exit_code == 2
+    assert "meal_plan_items: 12 rows" in result.output
+    assert not any(sql.startswith("EXPLAIN") for sql in cursor.executed)
+
+
+def test_min_rows_zero_checks_anyway(run):
+    assert run(FakeCursor(dict.fromkeys(TABLES, 0)), "--min-rows", "0").exit_code == 0
+
+
+def test_full_scan_fails(run):
+    result = run(FakeCursor(dict.fromkeys(TABLES, 50_000), scan="ALL"), "--analyze")
+
+    assert result.exit_code == 1
+    assert "FULL SCAN" in result.output
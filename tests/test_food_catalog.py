@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pytest
+
+import food_catalog
+from food_catalog import FoodCatalog
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(food_catalog.__file__)), "data")
+
+QUERIES = ["banana", "Cheddar Cheese", "apple raw", "zzqx not a food"]
+
+
+@pytest.fixture(scope="module")
+def catalog_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("catalog"))
+
+
+@pytest.fixture
+def catalog(catalog_dir):
+    return FoodCatalog(data_dir=DATA_DIR, catalog_dir=catalog_dir)
+
+
+def plain(results):
+    return [(data["food"] if data else None, score) for data, score in results]
+
+
+def test_match_many_same_result_cold_and_cached(catalog):
+    cold = plain(catalog.match_many(QUERIES))
+    warm = plain(catalog.match_many(QUERIES))
+
+    assert warm == cold
+    assert all(score is not None for _, score in warm)
+    assert cold[-1] == (None, 0.0)
+    assert catalog.cache_stats()["hits"] >= len(QUERIES)
+
+
+def test_match_many_after_match(catalog_dir):
+    fresh = plain(FoodCatalog(data_dir=DATA_DIR, catalog_dir=catalog_dir).match_many(QUERIES))
+
+    catalog = FoodCatalog(data_dir=DATA_DIR, catalog_dir=catalog_dir)
+    for query in QUERIES:
+        catalog.match(query)
+
+    assert plain(catalog.match_many(QUERIES)) == fresh
+
+
+def test_neighbors_built_after_artifact(tmp_path):
+    path = food_catalog.build_artifact(DATA_DIR, str(tmp_path))
+    assert not food_catalog.open_artifact(path).neighbors_ready
+
+    food_catalog.build_neighbors(path)
+    compiled = food_catalog.open_artifact(path)
+
+    assert compiled.neighbors_ready
+    assert compiled.neighbors.shape == (len(compiled), food_catalog.FOOD_SIMILAR_NEIGHBORS)
+
+
+def test_similar_not_ready_until_neighbors_built(tmp_path, monkeypatch):
+    release = threading.Event()
+    build_neighbors = food_catalog.build_neighbors
+
+    def slow_build(path):
+        release.wait(10)
+        return build_neighbors(path)
+
+    monkeypatch.setattr(food_catalog, "build_neighbors", slow_build)
+    catalog = FoodCatalog(data_dir=DATA_DIR, catalog_dir=str(tmp_path))
+
+    # loading never waits for the neighbor build
+    assert catalog.match("banana") is not None
+    with pytest.raises(food_catalog.NeighborsNotReady):
+        catalog.similar("banana")
+
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == "catalog-neighbors":
+            thread.join(10)
+
+    matched, similar = catalog.similar("banana", k=5)
+    assert matched is not None
+    assert len(similar) == 5
@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+from food_log_io import _prepare
+
+TODAY = date(2026, 3, 2)
+
+
+@pytest.mark.parametrize("value", ["nan", "NaN", "inf", "-Infinity", "1e999", "1e12", [1], {"a": 1}, "abc"])
+def test_bad_numbers_rejected(value):
+    with pytest.raises(ValueError):
+        _prepare({"food_name": "apple", "caloric_value": 52, "protein": value}, TODAY)
+
+
+def test_full_row_kept():
+    food, log_date, values = _prepare(
+        {"food_name": "apple", "log_date": "2026-02-01", "caloric_value": "52", "protein": ""}, TODAY
+    )
+
+    assert (food, log_date) == ("apple", date(2026, 2, 1))
+    assert values["caloric_value"] == 52.0
+    assert values["protein"] == 0
+
+
+def test_name_only_row_left_to_catalog():
+    assert _prepare({"food": "apple"}, TODAY) == ("apple", TODAY, None)
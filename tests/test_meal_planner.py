@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from food_catalog import CompiledCatalog
+from meal_planner import MealPlanner
+
+# (name, excluded for vegetarian, excluded for gluten free)
+FOODS = [
+    # true positives
+    ("cheeseburger", True, True),
+    ("double cheeseburger", True, True),
+    ("wonton soup", True, True),
+    ("lasagna", True, True),
+    ("chili con carne", True, False),
+    ("chili without beans canned", True, False),
+    ("big mac mcdonalds", True, True),
+    ("barbecue loaf", True, False),
+    ("spot cooked", True, False),
+    ("croutons seasoned", False, True),
+    ("french toast with butter", False, True),
+    ("cheese tortellini", False, True),
+    ("focaccia", False, True),
+    ("hand breaded chicken tenders carls jr", True, True),
+    ("onion rings burger king", False, True),
+    # false positives to avoid
+    ("red chili peppers", False, False),
+    ("green chili pepper", False, False),
+    ("bread loaf", False, True),
+    ("eisbonbons mac iver", False, False),
+    ("hot spot chips", False, False),
+    ("drumstick pods cooked", False, False),
+    ("cheese lasagna", False, True),
+    ("veggie burger", False, True),
+    ("meatless meatloaf", False, False),
+    ("french fries burger king", False, False),
+    ("limburger cheese", False, False),
+    ("buckwheat cooked", False, False),
+    ("crispy brown rice", False, False),
+]
+
+
+@pytest.fixture(scope="module")
+def planner():
+    names = [name for name, _, _ in FOODS]
+    columns = ["caloric value", "protein", "carbohydrates", "fat"]
+    # every row inside the meal-item calorie range, so only the words decide
+    matrix = np.tile(np.array([200, 10, 20, 8], dtype=np.float32), (len(names), 1))
+    return MealPlanner(SimpleNamespace(compiled=CompiledCatalog(names, columns, matrix)))
+
+
+def allowed(planner, pref):
+    rows = planner.eligible(frozenset([pref]))
+    return {planner.compiled.names[i] for i in rows}
+
+
+@pytest.mark.parametrize("name, meat, gluten", FOODS)
+def test_vegetarian_mask(planner, name, meat, gluten):
+    assert (name not in allowed(planner, "vegetarian")) == meat
+
+
+@pytest.mark.parametrize("name, meat, gluten", FOODS)
+def test_gluten_free_mask(planner, name, meat, gluten):
+    assert (name not in allowed(planner, "gluten free")) == gluten
+
+
+def test_no_preferences_keeps_everything(planner):
+    assert len(planner.eligible(frozenset())) == len(FOODS)
@@ -0,0 +1,54 @@
+import pytest
+from flask import Flask, session
+
+from session_store import SessionStore, init_sessions
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_sessions(app, {"backend": "memory", "ttl": 3600, "evict_interval": 60})
+
+    @app.route("/login")
+    def login():
+        session.clear()
+        session.regenerate()
+        session["user_id"] = 1
+        return "ok"
+
+    @app.route("/me")
+    def me():
+        return str(session.get("user_id"))
+
+    @app.route("/static-page")
+    def static_page():
+        return "hello"
+
+    return app.test_client()
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_vary_cookie_when_session_accessed(client):
+    assert "Cookie" in client.get("/me").vary
+    assert "Cookie" in client.get("/login").vary
+    # logged in: read but not modified
+    assert "Cookie" in client.get("/me").vary
+
+
+def test_no_vary_when_session_unused(client):
+    client.get("/login")
+    assert "Cookie" not in client.get("/static-page").vary
+
+
+def test_login_moves_session_id(client):
+    client.get("/login")
+    first = client.get_cookie("session").value
+    assert client.get("/me").text == "1"
+
+    client.get("/login")
+    assert client.get_cookie("session").value != first
+    assert client.get("/me").text == "1"
@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+from itertools import count
+
+import pytest
+
+from tip_pool import COMBOS, FALLBACK_TIP, TipPool
+
+DAY = date(2026, 3, 2)
+USERS = range(200)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return TipPool(str(tmp_path / "tips.json"), tips_per_combo=3, refill_interval=3600, max_age_days=30)
+
+
+def generator(batch="a"):
+    n = count()
+    return lambda category, style: f"{category} {style} tip {batch}{next(n)}"
+
+
+def picks(pool, day):
+    return [pool.pick(user, day) for user in USERS]
+
+
+def test_refill_shows_from_next_day(pool):
+    pool.refill(generator(), today=DAY)
+
+    assert set(picks(pool, DAY)) == {FALLBACK_TIP}
+    assert FALLBACK_TIP not in picks(pool, DAY + timedelta(days=1))
+
+
+def test_pick_stable_while_combos_fill(pool):
+    calls = count()
+
+    def partial(category, style):
+        # fail after a few tips: combos left part-filled
+        if next(calls) == 40:
+            raise RuntimeError("upstream down")
+        return f"{category} {style} early"
+
+    pool.refill(partial, today=DAY)
+    day = DAY + timedelta(days=1)
+    before = picks(pool, day)
+
+    pool.refill(generator("b"), today=day)
+    assert picks(pool, day) == before
+
+
+def test_rotation_keeps_the_day_stable(pool):
+    pool.refill(generator(), today=DAY)
+    day = DAY + timedelta(days=31)
+    before = picks(pool, day)
+
+    added = pool.refill(generator("b"), today=day)
+    assert added == 3 * len(COMBOS)
+    # retired today, still served today
+    assert picks(pool, day) == before
+
+    after = set(picks(pool, day + timedelta(days=1)))
+    assert not after & set(before)
+
+
+def test_retired_tips_dropped(pool):
+    pool.refill(generator(), today=DAY)
+    pool.refill(generator("b"), today=DAY + timedelta(days=31))
+    pool.refill(generator("c"), today=DAY + timedelta(days=32))
+
+    assert all(len(tips) == 3 for tips in pool._tips.values())
@@ -0,0 +1,54 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import upstream
+
+
+@pytest.fixture
+def busy_pool(monkeypatch):
+    """
+    One-worker pool held by a blocker until the returned event is set
+    """
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait, 10)
+    monkeypatch.setattr(upstream, "_executor", pool)
+    yield release
+    release.set()
+    pool.shutdown(wait=True)
+
+
+def test_timeout_does_not_cancel_for_other_waiters(busy_pool):
+    results = {}
+
+    def patient():
+        results["patient"] = upstream.call("test:shared", 10, lambda: "ok")
+
+    waiter = threading.Thread(target=patient)
+    waiter.start()
+    # wait until the patient caller has joined the in-flight call
+    while upstream._inflight.get("test:shared", [None, 0])[1] < 1:
+        time.sleep(0.01)
+
+    with pytest.raises(upstream.UpstreamTimeout):
+        upstream.call("test:shared", 0.05, lambda: "ok")
+
+    busy_pool.set()
+    waiter.join(10)
+    assert results["patient"] == "ok"
+    assert "test:shared" not in upstream._inflight
+
+
+def test_last_waiter_cancels_queued_call(busy_pool):
+    ran = []
+
+    with pytest.raises(upstream.UpstreamTimeout):
+        upstream.call("test:alone", 0.05, ran.append, 1)
+
+    assert "test:alone" not in upstream._inflight
+    busy_pool.set()
+    upstream._executor.shutdown(wait=True)
+    assert ran == []
@@ -0,0 +1,86 @@
+import base64
+import itertools
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import vision
+import vision_cache
+from vision_cache import VisionCache, dhash
+
+
+def photo(seed, size=(480, 360)):
+    """Smooth random blobs: enough structure for a stable dhash"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+def encode(img, fmt="JPEG", **kwargs):
+    buf = BytesIO()
+    img.save(buf, fmt, **kwargs)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = VisionCache(str(tmp_path / "vision.sqlite3"), max_distance=6, max_entries=5)
+    monkeypatch.setattr(vision, "get_vision_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    calls = []
+
+    def identify_food(base64_image):
+        calls.append(base64_image)
+        return f"food {len(calls)}"
+
+    monkeypatch.setattr(vision, "identify_food", identify_food)
+    return calls
+
+
+def test_reencoded_and_resized_photo_hits_cache(cache, remote):
+    img = photo(1)
+    assert vision.analyze_food_image(encode(img, quality=95)) == "food 1"
+
+    assert vision.analyze_food_image(encode(img, quality=40)) == "food 1"
+    assert vision.analyze_food_image(encode(img, "PNG")) == "food 1"
+    assert vision.analyze_food_image(encode(img.resize((240, 180)), quality=80)) == "food 1"
+    assert len(remote) == 1
+
+
+def test_different_photo_misses(cache, remote):
+    assert vision.analyze_food_image(encode(photo(1))) == "food 1"
+    assert vision.analyze_food_image(encode(photo(2))) == "food 2"
+    assert len(remote) == 2
+
+
+def test_undecodable_image_goes_remote_uncached(cache, remote):
+    junk = base64.b64encode(b"not an image").decode()
+    vision.analyze_food_image(junk)
+    vision.analyze_food_image(junk)
+    assert len(remote) == 2
+
+
+def test_eviction_stops_at_max_entries(cache, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(vision_cache.time, "time", lambda: next(clock))
+
+    hashes = [dhash(base64.b64decode(encode(photo(seed)))) for seed in range(8)]
+    for i, h in enumerate(hashes[:5]):
+        cache.store(h, f"food {i}")
+
+    # recently used entries survive, the least recently used go first
+    assert cache.lookup(hashes[0]) == "food 0"
+    for i, h in enumerate(hashes[5:], 5):
+        cache.store(h, f"food {i}")
+
+    count = cache._db.execute("SELECT COUNT(*) FROM vision_cache").fetchone()[0]
+    assert count == cache.max_entries
+    assert cache.lookup(hashes[0]) == "food 0"
+    assert cache.lookup(hashes[1]) is None
+    assert cache.lookup(hashes[7]) == "food 7"
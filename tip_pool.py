@@ -0,0 +1,214 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from config import TIP_POOL
+
+TIP_CATEGORIES = [
+    "hydration habit",
+    "protein intake",
+    "carbohydrate timing",
+    "healthy fat",
+    "portion control",
+    "meal timing",
+    "gut health",
+    "mindful eating",
+    "snack choice",
+    "sleep and nutrition"
+]
+
+TIP_STYLES = [
+    "practical advice",
+    "simple habit",
+    "did you know fact",
+    "daily challenge",
+    "common mistake to avoid"
+]
+
+COMBOS = [(c, s) for c in TIP_CATEGORIES for s in TIP_STYLES]
+
+# served for a combo with no tips yet (tips go live the day after refill adds them)
+FALLBACK_TIP = "Drink a glass of water before each meal; thirst is often mistaken for hunger."
+
+
+def generate_tip(client, category, style):
+    res = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "You are a nutrition coach. "
+                    "Give concise, non-repetitive daily tips. "
+                    "Avoid generic advice like 'eat more fruits and vegetables'."
+                )
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Give ONE {style} nutrition tip about {category}. "
+                    "Max 18 words. No emojis. No explanations."
+                )
+            }
+        ],
+        temperature=1.2,
+        presence_penalty=0.8,
+        frequency_penalty=0.6
+    )
+    return res.choices[0].message.content.strip()
+
+
+class TipPool:
+    """
+    Tips per (category, style), stored as JSON on disk and shared by
+    all workers. Serving is a dict lookup; generation only happens in
+    refill(), off the request path.
+
+    Each tip records the day it was added and, once rotated out, the
+    day it was retired. A day serves the tips added before it and not
+    retired before it, so what refill() does today only shows from
+    tomorrow and a user's tip never changes during the day.
+    """
+
+    def __init__(self, path, tips_per_combo, refill_interval, max_age_days):
+        self.path = path
+        self.tips_per_combo = tips_per_combo
+        self.refill_interval = refill_interval
+        self.max_age_days = max_age_days
+
+        self._tips = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _reload(self):
+        # another worker may have refilled the file
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        with open(self.path) as f:
+            tips = json.load(f)
+        # pools written before tips were dated: due for rotation
+        self._tips = {
+            key: [t if isinstance(t, dict) else {"tip": t, "added": "2000-01-01"} for t in entries]
+            for key, entries in tips.items()
+        }
+        self._mtime = mtime
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._tips, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def pick(self, user_id, day):
+        """
+        Same tip for the same user all day: the combo and slot come from
+        (user, day), over tips that can't change until tomorrow
+        """
+        seed = int(hashlib.sha256(f"{user_id}:{day.isoformat()}".encode()).hexdigest(), 16)
+        category, style = COMBOS[seed % len(COMBOS)]
+        today = day.isoformat()
+
+        with self._lock:
+            self._reload()
+            tips = [
+                t["tip"] for t in self._tips.get(f"{category}|{style}", [])
+                if t["added"] < today and t.get("retired", today) >= today
+            ]
+
+        if not tips:
+            return FALLBACK_TIP
+
+        return tips[(seed // len(COMBOS)) % len(tips)]
+
+    def refill(self, generate, today=None):
+        """
+        Retire tips older than max_age_days and top every combo up to
+        tips_per_combo live tips with generate(category, style).
+        An flock keeps workers from refilling at the same time.
+        """
+        today = (today or date.today()).isoformat()
+        expired = (date.fromisoformat(today) - timedelta(days=self.max_age_days)).isoformat()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        with open(self.path + ".lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            with self._lock:
+                self._reload()
+                for entries in self._tips.values():
+                    # retired before today: no day can serve them anymore
+                    entries[:] = [t for t in entries if t.get("retired", today) >= today]
+                    for t in entries:
+                        if "retired" not in t and t["added"] <= expired:
+                            t["retired"] = today
+                self._save()
+
+            added = 0
+            for category, style in COMBOS:
+                key = f"{category}|{style}"
+                with self._lock:
+                    self._reload()
+                    live = [t for t in self._tips.get(key, []) if "retired" not in t]
+                    missing = self.tips_per_combo - len(live)
+
+                for _ in range(missing):
+                    try:
+                        tip = generate(category, style)
+                    except Exception as e:
+                        print("TIP POOL REFILL ERROR:", e)
+                        return added
+
+                    with self._lock:
+                        entries = self._tips.setdefault(key, [])
+                        if tip and tip not in [t["tip"] for t in entries]:
+                            entries.append({"tip": tip, "added": today})
+                            added += 1
+                        self._save()
+
+            return added
+
+    def start_refill(self, generate):
+        """
+        Background refill loop (daemon thread, once per process)
+        """
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                self.refill(generate)
+                time.sleep(self.refill_interval)
+
+        self._thread = threading.Thread(target=loop, name="tip-pool-refill", daemon=True)
+        self._thread.start()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tip_pool():
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TipPool(**TIP_POOL)
+
+    return _pool
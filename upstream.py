@@ -0,0 +1,121 @@
+"""
+Bounded pool for the blocking OpenAI calls, with per-call deadlines and
+coalescing of identical in-flight requests.
+
+The OpenAI clients used here are created with max_retries=0: the SDK
+would otherwise retry inside the pool thread, past the deadline. They
+honour OPENAI_BASE_URL, so this can be pointed at a local fake server.
+"""
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from config import UPSTREAM
+import metrics
+
+
+class UpstreamTimeout(Exception):
+    pass
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=UPSTREAM["max_workers"],
+    thread_name_prefix="upstream"
+)
+
+# key -> [Future of the call already running for it, callers waiting on it]
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def request_key(kind, payload):
+    """
+    Stable key for coalescing: kind + sha256 of the payload
+    (JSON with sorted keys, or raw str/bytes)
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    elif not isinstance(payload, bytes):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode()
+    return f"{kind}:{hashlib.sha256(payload).hexdigest()}"
+
+
+def call(key, timeout, fn, *args, **kwargs):
+    """
+    Run fn on the bounded upstream pool and wait at most `timeout`
+    seconds. Concurrent calls with the same key share one upstream
+    request. On timeout the caller is released with UpstreamTimeout;
+    the last caller to give up cancels the shared call if it hasn't
+    started yet, so the others never see it cancelled.
+    """
+    kind = key.split(":")[0]
+
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        started = entry is None
+        if started:
+            entry = _inflight[key] = [_executor.submit(_timed, kind, fn, *args, **kwargs), 0]
+        entry[1] += 1
+        future = entry[0]
+
+    # outside the lock: a call that already finished runs the
+    # callback right here, and _forget takes the lock itself
+    if started:
+        future.add_done_callback(lambda f: _forget(key, f))
+
+    with metrics.track(kind):
+        try:
+            result = future.result(timeout=timeout)
+        except TimeoutError:
+            # only succeeds while still queued; a running call is bounded
+            # by the client-side timeout passed to the OpenAI request
+            if _leave(key, future):
+                future.cancel()
+            metrics.inc("nutrimind_upstream_errors_total", call=kind, error="timeout")
+            raise UpstreamTimeout(f"{kind} timed out after {timeout}s")
+        except BaseException:
+            _leave(key, future)
+            raise
+
+        _leave(key, future)
+        return result
+
+
+def _timed(kind, fn, *args, **kwargs):
+    # on the pool thread: the upstream call itself, once per coalesced group
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        metrics.inc("nutrimind_upstream_errors_total", call=kind, error="failed")
+        raise
+    finally:
+        metrics.observe("nutrimind_upstream_seconds", time.perf_counter() - start, call=kind)
+
+
+def _leave(key, future):
+    """
+    One caller stops waiting → True if it was the last one and the call
+    is still queued. The entry is dropped first, so nobody joins a call
+    that is about to be cancelled.
+    """
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        if entry is None or entry[0] is not future:
+            return False
+
+        entry[1] -= 1
+        if entry[1] > 0 or future.running() or future.done():
+            return False
+
+        del _inflight[key]
+        return True
+
+
+def _forget(key, future):
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        if entry is not None and entry[0] is future:
+            del _inflight[key]
@@ -1,14 +1,40 @@
+import base64
 from openai import OpenAI
 from dotenv import load_dotenv
+from vision_cache import dhash, get_vision_cache
+from config import UPSTREAM
 
 load_dotenv()
-client = OpenAI()
+# no SDK retries: the upstream pool thread is held for at most one timeout
+client = OpenAI(max_retries=0)
 
 def analyze_food_image(base64_image: str) -> str:
     """
     base64_image: PURE base64 (tanpa data:image/... prefix)
+
+    Near-identical photos (perceptual hash within VISION_CACHE
+    max_distance) return the earlier answer without a remote call.
     """
+    try:
+        h = dhash(base64.b64decode(base64_image))
+    except Exception:
+        # undecodable here; let the model have a look anyway
+        h = None
+
+    if h is not None:
+        cached = get_vision_cache().lookup(h)
+        if cached:
+            return cached
+
+    food_name = identify_food(base64_image)
+
+    if h is not None and food_name:
+        get_vision_cache().store(h, food_name)
+
+    return food_name
+
 
+def identify_food(base64_image: str) -> str:
     data_url = f"data:image/jpeg;base64,{base64_image}"
 
     response = client.responses.create(
@@ -30,7 +56,8 @@ def analyze_food_image(base64_image: str) -> str:
                     "detail": "low"
                 }
             ]
-        }]
+        }],
+        timeout=UPSTREAM["vision_timeout"]
     )
 
     return response.output_text.strip().lower()
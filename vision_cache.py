@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from config import VISION_CACHE
+
+
+def dhash(image_bytes):
+    """
+    64-bit difference hash: grayscale 9x8, one bit per horizontal
+    neighbour comparison. Re-shot / re-encoded photos of the same plate
+    land within a few bits of each other.
+    """
+    img = Image.open(BytesIO(image_bytes)).convert("L").resize((9, 8), Image.LANCZOS)
+    px = np.asarray(img, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+
+    h = 0
+    for b in bits.tolist():
+        h = (h << 1) | b
+    return h
+
+
+def _to_signed(h):
+    # sqlite INTEGER is signed 64-bit
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+class VisionCache:
+    """
+    phash -> food name, persisted in SQLite (shared by all workers),
+    looked up by Hamming distance <= max_distance, LRU-evicted
+    past max_entries
+    """
+
+    def __init__(self, path, max_distance, max_entries):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS vision_cache (
+              phash INTEGER PRIMARY KEY,
+              food_name TEXT NOT NULL,
+              last_used REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+        self._lock = threading.Lock()
+        self._version = None
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._names = []
+
+    def _refresh(self):
+        # data_version changes whenever another connection commits
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+
+        rows = self._db.execute("SELECT phash, food_name FROM vision_cache").fetchall()
+        self._hashes = np.array([r[0] for r in rows], dtype=np.int64).view(np.uint64)
+        self._names = [r[1] for r in rows]
+        self._version = version
+
+    def lookup(self, h):
+        with self._lock:
+            self._refresh()
+            if not self._names:
+                return None
+
+            xor = self._hashes ^ np.uint64(h)
+            dist = np.unpackbits(xor.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+            i = int(dist.argmin())
+            if dist[i] > self.max_distance:
+                return None
+
+            self._db.execute(
+                "UPDATE vision_cache SET last_used=? WHERE phash=?",
+                (time.time(), int(self._hashes[i].view(np.int64)))
+            )
+            self._db.commit()
+            return self._names[i]
+
+    def store(self, h, food_name):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO vision_cache (phash, food_name, last_used) VALUES (?,?,?)",
+                (_to_signed(h), food_name, time.time())
+            )
+            self._db.execute("""
+                DELETE FROM vision_cache WHERE phash IN (
+                  SELECT phash FROM vision_cache
+                  ORDER BY last_used DESC
+                  LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+            # own commits don't bump data_version, reload on next lookup
+            self._version = None
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM vision_cache")
+            self._db.commit()
+            self._version = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_vision_cache():
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VisionCache(**VISION_CACHE)
+
+    return _cache